@@ -2,21 +2,110 @@ import time
 import random
 import json
 import os
+import queue
+import stat
 import sys
+import atexit
+import functools
+import hashlib
+import threading
 import warnings
+import zlib
 import akshare as ak
+import numpy as np
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 from rich.console import Console, Group
 from rich.table import Table
 from rich.live import Live
 from rich.text import Text
+from rich.style import Style
 from rich.box import ROUNDED
 
+try:
+    import orjson  # 更快的JSON序列化（可选依赖）
+except ImportError:
+    orjson = None
+
+try:
+    import xxhash  # 更快的内容哈希（可选依赖）
+except ImportError:
+    xxhash = None
+
+try:
+    # 配置文件变更通知（可选依赖，Linux下基于inotify）
+    from watchdog.observers import Observer
+    from watchdog.observers.polling import PollingObserver
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    PollingObserver = None
+    FileSystemEventHandler = object
+
 # 忽略urllib3的OpenSSL警告
 warnings.filterwarnings('ignore', category=UserWarning, module='urllib3')
 
+def _json_default(obj):
+    """标准库json不支持的numpy类型：标量转为Python数值，数组转为列表"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_dumps_bytes(obj) -> bytes:
+    """序列化为带缩进的UTF-8 JSON字节串（优先使用orjson，未安装时回退到标准库json）"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, indent=2, default=_json_default).encode('utf-8')
+
+
+# 写文件时每次 os.write 的最大字节数
+WRITE_CHUNK_SIZE = 128 * 1024
+
+
+def write_bytes_atomic(path: str, data: bytes):
+    """原子写文件：先写入同目录下的临时文件并落盘，再重命名覆盖目标文件（不会留下写了一半的文件）
+    
+    目标是符号链接时写入链接指向的文件（不把链接替换成普通文件）；目标已存在时保留原文件的权限
+    """
+    path = os.path.realpath(path)
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = None
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if mode is not None:
+            # 写入内容前先设置权限，私密文件（如持仓配置）不会短暂以默认权限出现
+            if hasattr(os, 'fchmod'):
+                os.fchmod(fd, mode)
+            else:
+                os.chmod(tmp_path, mode)
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view[:WRITE_CHUNK_SIZE])
+            view = view[written:]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+
+
+def json_loads(data: bytes):
+    """解析JSON字节串（优先使用orjson，未安装时回退到标准库json）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
 # -------------------------- 核心配置 --------------------------
 # 注意：股票代码列表现在从配置文件读取，不再在这里定义
 # 如需添加股票，请在 config/holdings.json 的 "stocks" 数组中添加股票代码
@@ -30,17 +119,18 @@ def calculate_holding_from_transactions(transactions: List[Dict]) -> Tuple[float
     if not transactions or len(transactions) == 0:
         return 0.0, 0.0
     
-    total_quantity = 0.0
-    total_cost = 0.0
+    # 一次性转换为结构化数组，用向量化运算求和（交易记录较多时明显快于逐条循环）
+    arr = np.fromiter(
+        ((float(t.get('quantity', 0)), float(t.get('price', 0))) for t in transactions),
+        dtype=np.dtype([('q', 'f8'), ('p', 'f8')]),
+        count=len(transactions)
+    )
+    valid = arr[(arr['q'] > 0) & (arr['p'] > 0)]
     
-    for trans in transactions:
-        quantity = float(trans.get('quantity', 0))
-        price = float(trans.get('price', 0))
-        if quantity > 0 and price > 0:
-            total_quantity += quantity
-            total_cost += quantity * price
-    
-    avg_price = total_cost / total_quantity if total_quantity > 0 else 0.0
+    total_quantity = float(valid['q'].sum())
+    if total_quantity <= 0:
+        return 0.0, 0.0
+    avg_price = float((valid['q'] * valid['p']).sum()) / total_quantity
     return total_quantity, avg_price
 
 
@@ -52,8 +142,8 @@ def load_holdings_config() -> Dict:
     """
     if os.path.exists(HOLDINGS_CONFIG_FILE):
         try:
-            with open(HOLDINGS_CONFIG_FILE, 'r', encoding='utf-8') as f:
-                config = json.load(f)
+            with open(HOLDINGS_CONFIG_FILE, 'rb') as f:
+                config = json_loads(f.read())
                 # 验证格式：必须包含funds和stocks字段
                 if 'funds' not in config:
                     config['funds'] = {
@@ -97,8 +187,7 @@ def load_holdings_config() -> Dict:
                 # 如果转换了旧格式，保存文件
                 if needs_save:
                     try:
-                        with open(HOLDINGS_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                            json.dump(config, f, ensure_ascii=False, indent=2)
+                        write_bytes_atomic(HOLDINGS_CONFIG_FILE, json_dumps_bytes(config))
                         print(f"已自动将旧格式转换为新格式: {HOLDINGS_CONFIG_FILE}")
                     except:
                         pass
@@ -118,8 +207,7 @@ def load_holdings_config() -> Dict:
         }
         try:
             os.makedirs(os.path.dirname(HOLDINGS_CONFIG_FILE), exist_ok=True)
-            with open(HOLDINGS_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(default_config, f, ensure_ascii=False, indent=2)
+            write_bytes_atomic(HOLDINGS_CONFIG_FILE, json_dumps_bytes(default_config))
             print(f"已创建默认持仓配置文件: {HOLDINGS_CONFIG_FILE}")
         except Exception as e:
             print(f"警告：无法创建持仓配置文件 {HOLDINGS_CONFIG_FILE}: {e}")
@@ -132,10 +220,26 @@ POLL_INTERVAL = 0.5
 MIN_REQUEST_INTERVAL = 0.3  # 每个请求之间的最小间隔（秒）
 MAX_RANDOM_DELAY = 0.2  # 随机延迟最大值（秒），增加随机性避免被识别为机器人
 RETRY_DELAY = 2  # 重试延迟（秒）
+HTTP_TIMEOUT = (2, 3)  # HTTP请求超时（连接超时, 读取超时）（秒），东方财富+雪球两次请求合计远小于 FETCH_TIMEOUT
+HTTP_MAX_RETRIES = 1  # 服务端错误（500/502/504）时的最大重试次数（连接/读取超时不重试）
+HTTP_BACKOFF_FACTOR = 0.5  # 重试退避系数（每次重试的等待时间指数增长）
+RATE_LIMIT_STATUS_CODES = (429, 503)  # 表示被限流的HTTP状态码：不重试，暂停所有逐个获取行情的请求
+RATE_LIMIT_PAUSE = RETRY_DELAY * 2  # 被限流且服务端没有返回 Retry-After 时的暂停时间（秒）
+MAX_RATE_LIMIT_PAUSE = 300  # 服务端返回的 Retry-After 最多遵守多久（秒）
+BATCH_QUOTE_TIMEOUT = 3  # 腾讯批量行情请求的超时（秒），只请求一次不重试（主循环中同步请求）
+IDLE_POLL_INTERVAL = 10  # 休市时（没有股票在交易时间内）的轮询间隔（秒）
+MAX_FETCH_WORKERS = 8  # 并发获取行情的最大线程数（也是令牌桶允许的最大突发请求数）
+FETCH_TIMEOUT = 10  # 并发获取行情时，等待所有请求完成的最长时间（秒）
+
+# 当天历史数据的保存间隔（秒）：轮询中的保存请求合并后由后台线程最多每隔这么久保存一次
+SAVE_DEBOUNCE_S = 10
 
 # 缓存目录
 CACHE_DIR = "./history"
 
+# 昨收价缓存文件：{日期: {股票代码: 昨收价}}，与每天的历史数据文件分开保存
+YESTERDAY_CLOSE_CACHE_FILE = os.path.join(CACHE_DIR, "yesterday_close.json")
+
 # 持仓配置文件路径
 HOLDINGS_CONFIG_FILE = "./config/holdings.json"
 
@@ -143,30 +247,234 @@ HOLDINGS_CONFIG_FILE = "./config/holdings.json"
 STOP_UPDATE_HOUR = 15
 STOP_UPDATE_MINUTE = 1
 
+# 昨收价缓存写锁（并发获取行情时保护缓存的更新和落盘）
+_yesterday_close_lock = threading.Lock()
+# 昨收价缓存是否有未保存的新数据（每轮轮询结束或程序退出时统一写盘）
+_yesterday_close_dirty = False
+
+# 东方财富单股行情接口（直接请求，跳过akshare的DataFrame构造）
+EM_QUOTE_URL = "https://push2.eastmoney.com/api/qt/stock/get"
+
+# 腾讯批量行情接口（逗号连接多个代码，一次请求返回所有股票，A股和美股通用）
+TENCENT_QUOTE_URL = "https://qt.gtimg.cn/q="
+
+# 雪球行情JSON接口（直接请求，跳过akshare的DataFrame构造）
+XQ_QUOTE_URL = "https://stock.xueqiu.com/v5/stock/quote.json"
+XQ_USER_AGENT = ("Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 "
+                 "(KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1")
+try:
+    from akshare.stock.cons import xq_a_token as XQ_A_TOKEN  # 复用akshare内置的雪球token
+except ImportError:
+    XQ_A_TOKEN = ""
+
+# 共享的HTTP会话：复用TCP/TLS连接（keep-alive），避免每次请求重新握手
+# 逐个获取行情的请求（在线程池中执行）：服务端错误由urllib3自动重试一次；
+# 限流（429/503）不在这里重试，由 check_rate_limited 暂停令牌桶，保证重试也受防封禁限流约束
+_http_retry = Retry(
+    total=HTTP_MAX_RETRIES,
+    connect=0,
+    read=0,
+    backoff_factor=HTTP_BACKOFF_FACTOR,
+    status_forcelist=(500, 502, 504),
+    respect_retry_after_header=False,
+)
+_http_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=_http_retry)
+_session = requests.Session()
+_session.mount("http://", _http_adapter)
+_session.mount("https://", _http_adapter)
+# 腾讯批量行情在主循环中同步请求：不重试，失败的股票本轮交给线程池逐个获取，避免阻塞界面刷新和报警
+_session.mount(TENCENT_QUOTE_URL, HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0))
+
+# 后台写文件队列：(文件路径, 要写入的JSON对象或已序列化的字节串, 写入成功后的回调)，由单个守护线程顺序写盘，不阻塞轮询
+_writer_queue: "queue.Queue[Tuple[str, object, Optional[Callable[[], None]]]]" = queue.Queue()
+_writer_thread: Optional[threading.Thread] = None
+_writer_thread_lock = threading.Lock()
+
+# 报警声音队列：最多积压1个请求，由守护线程播放（每秒最多一次）
+_alert_queue: "queue.Queue[int]" = queue.Queue(maxsize=1)
+_alert_thread: Optional[threading.Thread] = None
+_alert_thread_lock = threading.Lock()
+
+# 当天历史数据的后台保存：只保留最新的一份待保存快照（新快照直接替换旧快照）
+_history_save_lock = threading.Lock()
+_history_save_pending: Optional[tuple] = None
+_history_save_wakeup = threading.Event()
+_history_save_thread: Optional[threading.Thread] = None
+# 保证同一时刻只有一个 save_yesterday_history 在执行，写盘顺序与保存顺序一致
+_history_save_io_lock = threading.Lock()
+
+# 配置文件变更标记：由文件监听线程设置，主循环检查后清除并重新加载配置
+_config_dirty = threading.Event()
+_config_observer = None
+
+# 历史数据文件最近一次写入内容的指纹（不含时间戳）：{文件路径: blake2b摘要}，内容未变时跳过写盘
+_history_fingerprints: Dict[str, bytes] = {}
+
+# 已确认存在的目录（避免每次读写文件都检查目录）
+_dirs_ensured = set()
+
+# 美股日K线历史缓存：{(股票代码, 当天日期): DataFrame}，同一天内同一股票只请求一次
+_us_daily_cache_lock = threading.Lock()
+_us_daily_cache: Dict[Tuple[str, str], pd.DataFrame] = {}
+
+
+def _json_writer_loop():
+    """后台写文件线程：依次取出队列中的写入任务并保存为JSON文件，写入成功后调用回调"""
+    while True:
+        path, payload, on_written = _writer_queue.get()
+        try:
+            write_bytes_atomic(path, payload if isinstance(payload, bytes) else json_dumps_bytes(payload))
+            if on_written is not None:
+                on_written()
+        except Exception:
+            pass  # 静默失败
+        finally:
+            _writer_queue.task_done()
+
+
+def write_json_async(path: str, payload, on_written: Optional[Callable[[], None]] = None):
+    """把JSON写入任务交给后台线程（调用方不能再修改 payload）
+    
+    :param payload: JSON对象，或 json_dumps_bytes 已序列化好的字节串（直接写入，不再重复序列化）
+    :param on_written: 写入成功后在写文件线程中调用（写入失败不调用）
+    """
+    global _writer_thread
+    with _writer_thread_lock:
+        if _writer_thread is None:
+            _writer_thread = threading.Thread(target=_json_writer_loop, name="json-writer", daemon=True)
+            _writer_thread.start()
+    _writer_queue.put((path, payload, on_written))
+
+
+def flush_pending_writes():
+    """等待后台写文件队列全部写完（程序退出前调用）"""
+    if _writer_thread is not None:
+        _writer_queue.join()
+
+
+# 退出时等待后台写入完成（最先注册，保证在其他退出保存之后才执行）
+atexit.register(flush_pending_writes)
+
+
+def get_config_file_key() -> Optional[Tuple[int, int]]:
+    """获取持仓配置文件的变更标识 (修改时间ns, 文件大小)，文件不存在返回None
+    
+    只做一次 stat 调用；同时比较大小，避免写入过程中 mtime 未变但内容已变的情况被漏掉
+    """
+    try:
+        st = os.stat(HOLDINGS_CONFIG_FILE)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def get_config_content_hash() -> Optional[int]:
+    """计算持仓配置文件内容的哈希（优先使用xxhash，未安装时回退到crc32），文件不存在返回None
+    
+    只在 (修改时间, 文件大小) 变化时调用，用于过滤 touch 等内容未变化的写入
+    """
+    try:
+        with open(HOLDINGS_CONFIG_FILE, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if xxhash is not None:
+        return xxhash.xxh64(data).intdigest()
+    return zlib.crc32(data)
+
+
+class ConfigFileEventHandler(FileSystemEventHandler):
+    """只关注持仓配置文件的创建/修改/移动事件，收到事件后标记配置需要重新加载"""
+    
+    def __init__(self, config_file: str):
+        super().__init__()
+        self.config_file = os.path.abspath(config_file)
+    
+    def on_any_event(self, event):
+        if event.event_type not in ('modified', 'moved', 'created'):
+            return
+        # 编辑器常用"写临时文件再重命名"的方式保存，需要同时检查移动的目标路径
+        paths = (getattr(event, 'src_path', None), getattr(event, 'dest_path', None))
+        if any(path and os.path.abspath(path) == self.config_file for path in paths):
+            _config_dirty.set()
+
+
+def start_config_watcher() -> bool:
+    """启动持仓配置文件监听（只监听配置文件所在目录，不递归）
+    
+    :return: 是否启动成功；未安装watchdog或启动失败时返回False，调用方继续按修改时间轮询
+    """
+    global _config_observer
+    if Observer is None:
+        return False
+    if _config_observer is not None:
+        return True
+    watch_dir = os.path.dirname(os.path.abspath(HOLDINGS_CONFIG_FILE))
+    handler = ConfigFileEventHandler(HOLDINGS_CONFIG_FILE)
+    # 优先使用系统通知（inotify等），不可用时（如inotify数量达到上限）回退到60秒轮询
+    for observer_factory in (Observer, lambda: PollingObserver(timeout=60)):
+        try:
+            observer = observer_factory()
+            observer.schedule(handler, watch_dir, recursive=False)
+            observer.daemon = True
+            observer.start()
+        except Exception:
+            continue
+        _config_observer = observer
+        atexit.register(observer.stop)
+        return True
+    return False
+
 
 def get_cache_file_path(date_str: Optional[str] = None) -> str:
     """获取缓存文件路径（按日期）"""
     if date_str is None:
         date_str = datetime.now().strftime("%Y-%m-%d")
     
-    # 确保目录存在
-    if not os.path.exists(CACHE_DIR):
+    # 确保目录存在（每个目录只创建/检查一次，之后不再做系统调用）
+    if CACHE_DIR not in _dirs_ensured:
         os.makedirs(CACHE_DIR, exist_ok=True)
+        _dirs_ensured.add(CACHE_DIR)
     
     return os.path.join(CACHE_DIR, f"{date_str}.json")
 
 
 def load_yesterday_close_cache(date_str: Optional[str] = None) -> Dict[str, float]:
-    """从文件加载昨收价缓存（按日期）
+    """加载昨收价缓存（启动时调用一次，之后只在内存中更新）
     
-    只支持新格式：{"date": "...", "stocks": [...]}
-    从stocks数组中提取收盘价
+    先从该日期的历史数据文件中提取收盘价，再用昨收价缓存文件中该日期的数据覆盖（接口返回的昨收更准确）
     """
-    cache_file = get_cache_file_path(date_str)
+    if date_str is None:
+        date_str = datetime.now().strftime("%Y-%m-%d")
+    
+    cache = {}
+    history_file = get_cache_file_path(date_str)
+    try:
+        mtime = os.stat(history_file).st_mtime
+    except OSError:
+        pass
+    else:
+        # 复制一份，避免修改 lru_cache 中的字典
+        cache.update(_load_yesterday_close_cache_cached(history_file, mtime))
+    
+    try:
+        with open(YESTERDAY_CLOSE_CACHE_FILE, 'rb') as f:
+            data = json_loads(f.read())
+        closes = data.get(date_str) if isinstance(data, dict) else None
+        if isinstance(closes, dict):
+            cache.update({code: float(close) for code, close in closes.items() if close is not None})
+    except Exception:
+        pass
+    return cache
+
+
+@functools.lru_cache(maxsize=8)
+def _load_yesterday_close_cache_cached(cache_file: str, mtime: float) -> Dict[str, float]:
+    """解析昨收价缓存文件（mtime 参与缓存键，文件被修改后自动失效）"""
     if os.path.exists(cache_file):
         try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(cache_file, 'rb') as f:
+                data = json_loads(f.read())
                 
                 # 只处理新格式（包含date和stocks字段）
                 if isinstance(data, dict) and 'date' in data and 'stocks' in data:
@@ -178,6 +486,9 @@ def load_yesterday_close_cache(date_str: Optional[str] = None) -> Dict[str, floa
                         if code and price is not None:
                             cache[code] = float(price)
                     return cache
+                # 旧版本把昨收价缓存 {股票代码: 昨收价} 直接写在了历史数据文件中
+                elif isinstance(data, dict) and data and all(isinstance(v, (int, float)) for v in data.values()):
+                    return {code: float(price) for code, price in data.items()}
                 # 如果是数组格式（旧的新格式），取最后一个元素
                 elif isinstance(data, list) and len(data) > 0:
                     last_item = data[-1]
@@ -196,26 +507,71 @@ def load_yesterday_close_cache(date_str: Optional[str] = None) -> Dict[str, floa
 
 
 def save_yesterday_close_cache(cache: Dict[str, float], date_str: Optional[str] = None):
-    """保存昨收价缓存到文件（按日期）"""
+    """保存昨收价缓存到昨收价缓存文件（只保留当前日期的数据，不会覆盖历史数据文件）"""
+    if date_str is None:
+        date_str = datetime.now().strftime("%Y-%m-%d")
     try:
-        cache_file = get_cache_file_path(date_str)
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(cache, f, ensure_ascii=False, indent=2)
+        get_cache_file_path(date_str)  # 确保缓存目录存在
+        write_json_async(YESTERDAY_CLOSE_CACHE_FILE, {date_str: dict(cache)})
     except Exception as e:
         pass  # 静默失败
 
 
-def get_stock_daily_data(stock_code: str, date_str: str) -> Optional[Dict]:
-    """获取股票日K线数据（开/收/高/低/成交量等）"""
+def remember_yesterday_close(stock_code: str, yesterday_close: float, yesterday_close_cache: Dict[str, float]):
+    """记录新获取到的昨收价（只更新内存缓存并标记为脏，由 flush_yesterday_close_cache 统一写盘）"""
+    global _yesterday_close_dirty
+    with _yesterday_close_lock:
+        yesterday_close_cache[stock_code] = yesterday_close
+        _yesterday_close_dirty = True
+
+
+def flush_yesterday_close_cache(yesterday_close_cache: Dict[str, float], date_str: str):
+    """如果昨收价缓存有新数据，保存到文件（每轮轮询最多写一次）"""
+    global _yesterday_close_dirty
+    with _yesterday_close_lock:
+        if not _yesterday_close_dirty:
+            return
+        cache_copy = dict(yesterday_close_cache)
+        _yesterday_close_dirty = False
+    save_yesterday_close_cache(cache_copy, date_str)
+
+
+def get_us_daily_history(stock_code: str) -> pd.DataFrame:
+    """获取美股日K线历史（按 (股票代码, 当天日期) 缓存，避免同一天内重复请求完整历史）"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    key = (stock_code, today)
+    with _us_daily_cache_lock:
+        df = _us_daily_cache.get(key)
+    if df is not None:
+        return df
+    
+    df = ak.stock_us_daily(symbol=stock_code, adjust="")
+    with _us_daily_cache_lock:
+        # 清理前一天的缓存，避免长期运行时内存增长
+        for stale_key in [k for k in _us_daily_cache if k[1] != today]:
+            del _us_daily_cache[stale_key]
+        _us_daily_cache[key] = df
+    return df
+
+
+def get_stock_daily_data(stock_code: str, date_str: str, is_us: Optional[bool] = None, code_with_prefix: Optional[str] = None) -> Optional[Dict]:
+    """获取股票日K线数据（开/收/高/低/成交量等）
+    
+    :param is_us: 是否为美股（可传入预先计算好的值，为None时自动判断）
+    :param code_with_prefix: 带市场前缀的代码（可传入预先计算好的值，为None时自动计算）
+    """
     try:
-        if is_us_stock(stock_code):
+        if is_us is None or code_with_prefix is None:
+            is_us, code_with_prefix, _ = get_stock_market_info(stock_code)
+        
+        if is_us:
             # 美股：使用stock_us_daily
             try:
-                df = ak.stock_us_daily(symbol=stock_code, adjust="")
+                df = get_us_daily_history(stock_code)
                 if not df.empty:
-                    # 查找指定日期的数据
-                    df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-                    row = df[df['date'] == date_str]
+                    # 查找指定日期的数据（直接按天比较，不对整段历史做日期字符串转换）
+                    mask = df['date'].values.astype('datetime64[D]') == np.datetime64(date_str, 'D')
+                    row = df[mask]
                     if not row.empty:
                         return {
                             'open': float(row.iloc[0]['open']) if 'open' in row.columns else None,
@@ -230,7 +586,6 @@ def get_stock_daily_data(stock_code: str, date_str: str) -> Optional[Dict]:
         else:
             # A股：使用stock_zh_a_daily
             try:
-                code_with_prefix = f"sz{stock_code}" if stock_code.startswith(('00', '30')) else f"sh{stock_code}"
                 # 获取最近的数据
                 df = ak.stock_zh_a_daily(symbol=code_with_prefix, start_date=date_str.replace('-', ''), end_date=date_str.replace('-', ''), adjust="")
                 if not df.empty:
@@ -250,66 +605,145 @@ def get_stock_daily_data(stock_code: str, date_str: str) -> Optional[Dict]:
         return None
 
 
-def save_yesterday_history(stock_states: Dict[str, Dict], funds_config: Dict, yesterday_close_cache: Dict[str, float], target_date: str):
+def build_stock_arrays(stock_states: Dict[str, Dict], previous: Optional[Dict] = None) -> Dict:
+    """把 stock_states 中参与汇总计算和报警检查的字段转换为列式（SoA）数组
+    
+    价格/成本价/涨跌幅/报警价格缺失用 NaN 表示，无持仓数量为 0，昨收价缺失为 0
+    :param previous: 之前构建的列式数组（重新构建时保留其中的报警触发标记和昨收价）
+    :return: {'index': {股票代码: 下标}, 'price': 现价数组, 'qty': 持仓数量数组, 'cost': 成本价数组, 'chg': 涨跌幅数组,
+              'alert_up'/'alert_down': 报警价格数组, 'alert_triggered_up'/'alert_triggered_down': 报警触发标记数组,
+              'yc': 昨收价数组, 'inv_yc': 100/昨收价 数组（昨收价缺失时为 0）}
+    """
+    codes = list(stock_states.keys())
+    n = len(codes)
+    price = np.full(n, np.nan)
+    qty = np.zeros(n)
+    cost = np.full(n, np.nan)
+    chg = np.full(n, np.nan)
+    alert_up = np.full(n, np.nan)
+    alert_down = np.full(n, np.nan)
+    triggered_up = np.zeros(n, dtype=bool)
+    triggered_down = np.zeros(n, dtype=bool)
+    yc = np.zeros(n)
+    inv_yc = np.zeros(n)
+    for i, code in enumerate(codes):
+        state = stock_states[code]
+        if state['last_price'] is not None:
+            price[i] = state['last_price']
+            chg[i] = state['last_change_pct']
+        if state['holding_quantity']:
+            qty[i] = state['holding_quantity']
+        if state['holding_price'] is not None:
+            cost[i] = state['holding_price']
+        if state['alert_up'] is not None:
+            alert_up[i] = state['alert_up']
+        if state['alert_down'] is not None:
+            alert_down[i] = state['alert_down']
+        if previous is not None and code in previous['index']:
+            j = previous['index'][code]
+            triggered_up[i] = previous['alert_triggered_up'][j]
+            triggered_down[i] = previous['alert_triggered_down'][j]
+            yc[i] = previous['yc'][j]
+            inv_yc[i] = previous['inv_yc'][j]
+    return {
+        'index': {code: i for i, code in enumerate(codes)},
+        'price': price,
+        'qty': qty,
+        'cost': cost,
+        'chg': chg,
+        'alert_up': alert_up,
+        'alert_down': alert_down,
+        'alert_triggered_up': triggered_up,
+        'alert_triggered_down': triggered_down,
+        'yc': yc,
+        'inv_yc': inv_yc,
+    }
+
+
+def save_yesterday_history(stock_states: Dict[str, Dict], funds_config: Dict, yesterday_close_cache: Dict[str, float], target_date: str, stock_arrays: Optional[Dict] = None):
     """保存指定日期的历史数据（包含详细的K线数据）
     
     注意：当天数据只需要存最新状态，不需要存每一条历史记录
     历史数据应该包含完整信息，参照当天数据的格式
+    :param stock_arrays: build_stock_arrays 生成的列式数组（为None或与 stock_states 不一致时重新构建）
     """
     try:
         history_file = get_cache_file_path(target_date)
         
-        # 计算统计数据
-        total_holding_value = 0.0
-        total_profit = 0.0
-        stock_snapshots = []
+        if stock_arrays is None or len(stock_arrays['index']) != len(stock_states):
+            stock_arrays = build_stock_arrays(stock_states)
+        index = stock_arrays['index']
+        qty = stock_arrays['qty']
+        cost = stock_arrays['cost']
+        # 计算用价格：优先使用K线数据的收盘价，否则使用当前价格
+        prices = stock_arrays['price'].copy()
         
-        for code, state in stock_states.items():
-            if state['last_price'] is not None:
-                # 获取详细的K线数据（使用目标日期）
-                kline_data = get_stock_daily_data(code, target_date)
-                
-                # 如果K线数据获取失败，尝试使用当前价格作为收盘价
-                if kline_data is None:
-                    kline_data = {
-                        'open': None,
-                        'close': state['last_price'],  # 使用当前价格作为收盘价
-                        'high': None,
-                        'low': None,
-                        'volume': None,
-                        'amount': None,
-                    }
-                
-                # 计算持仓市值和盈亏
-                holding_value = None
-                profit = None
-                if state['holding_quantity'] is not None and state['holding_quantity'] > 0:
-                    # 使用K线数据的收盘价（如果有），否则使用当前价格
-                    price_for_calc = kline_data.get('close') if kline_data and kline_data.get('close') is not None else state['last_price']
-                    holding_value = price_for_calc * state['holding_quantity']
-                    total_holding_value += holding_value
-                    if state['holding_price'] is not None:
-                        profit = (price_for_calc - state['holding_price']) * state['holding_quantity']
-                        total_profit += profit
-                
-                # 使用K线数据的收盘价（如果有），否则使用当前价格
-                final_price = kline_data.get('close') if kline_data and kline_data.get('close') is not None else state['last_price']
-                
-                snapshot = {
-                    'code': code,
-                    'name': state['last_stock_name'],
-                    'price': final_price,  # 收盘价（优先使用K线数据）
-                    'change_pct': state['last_change_pct'],  # 涨跌幅
-                    'update_time': state['last_update_time'],  # 最后更新时间
-                    'holding_price': state['holding_price'],  # 平均持仓成本价
-                    'holding_quantity': state['holding_quantity'],  # 持仓总数量
-                    'holding_value': holding_value,  # 持仓市值
-                    'profit': profit,  # 单只股票盈亏
-                    'yesterday_close': yesterday_close_cache.get(code),  # 昨收价（相对于目标日期）
-                    'transactions': state.get('transactions', []),  # 交易记录数组
-                    'kline': kline_data  # K线数据（开/收/高/低/成交量/成交额等）
+        # 获取详细的K线数据（使用目标日期）
+        codes = [code for code, state in stock_states.items() if state['last_price'] is not None]
+        kline_map = {}
+        # A股当天数据：腾讯接口一次批量请求即可拿到持仓股票的开/收/高/低/成交量
+        if target_date == datetime.now().strftime("%Y-%m-%d"):
+            a_codes = [code for code in codes if not stock_states[code].get('is_us')]
+            if a_codes:
+                try:
+                    kline_map.update(fetch_a_share_klines_tencent(a_codes, stock_states))
+                except Exception:
+                    pass  # 批量请求失败时逐个获取
+        # 美股、历史日期及批量结果中缺失的股票：线程池并发逐个获取
+        pending_codes = [code for code in codes if code not in kline_map]
+        if pending_codes:
+            with ThreadPoolExecutor(max_workers=min(8, len(pending_codes))) as ex:
+                kline_map.update(zip(pending_codes, ex.map(
+                    lambda c: get_stock_daily_data(c, target_date, stock_states[c].get('is_us'), stock_states[c].get('prefixed')),
+                    pending_codes
+                )))
+        
+        for code in codes:
+            state = stock_states[code]
+            kline_data = kline_map.get(code)
+            
+            # 如果K线数据获取失败，尝试使用当前价格作为收盘价
+            if kline_data is None:
+                kline_data = {
+                    'open': None,
+                    'close': state['last_price'],  # 使用当前价格作为收盘价
+                    'high': None,
+                    'low': None,
+                    'volume': None,
+                    'amount': None,
                 }
-                stock_snapshots.append(snapshot)
+                kline_map[code] = kline_data
+            close = kline_data.get('close')
+            prices[index[code]] = close if close is not None else state['last_price']
+        
+        # 向量化计算持仓市值和盈亏（无价格的股票为NaN，不计入汇总）
+        has_holding = (qty > 0) & ~np.isnan(prices)
+        holding_value_arr = prices * qty
+        profit_arr = (prices - cost) * qty
+        has_profit = has_holding & ~np.isnan(cost)
+        total_holding_value = float(holding_value_arr[has_holding].sum())
+        total_profit = float(profit_arr[has_profit].sum())
+        
+        stock_snapshots = []
+        for code in codes:
+            state = stock_states[code]
+            kline_data = kline_map[code]
+            i = index[code]
+            snapshot = {
+                'code': code,
+                'name': state['last_stock_name'] or get_stock_name(code),
+                'price': float(prices[i]),  # 收盘价（优先使用K线数据）
+                'change_pct': state['last_change_pct'],  # 涨跌幅
+                'update_time': state['last_update_time'],  # 最后更新时间
+                'holding_price': state['holding_price'],  # 平均持仓成本价
+                'holding_quantity': state['holding_quantity'],  # 持仓总数量
+                'holding_value': float(holding_value_arr[i]) if has_holding[i] else None,  # 持仓市值
+                'profit': float(profit_arr[i]) if has_profit[i] else None,  # 单只股票盈亏
+                'yesterday_close': yesterday_close_cache.get(code),  # 昨收价（相对于目标日期）
+                'transactions': state.get('transactions', []),  # 交易记录数组
+                'kline': kline_data  # K线数据（开/收/高/低/成交量/成交额等）
+            }
+            stock_snapshots.append(snapshot)
         
         # 计算总资产
         available_funds = funds_config.get('available_funds', 0.0)
@@ -317,9 +751,9 @@ def save_yesterday_history(stock_states: Dict[str, Dict], funds_config: Dict, ye
         total_assets = available_funds + total_holding_value
         
         # 构建完整的历史数据（单个对象，不是数组，因为只需要最新状态）
+        # 时间戳放在最后，指纹只计算它之前的内容
         history_data = {
             'date': target_date,
-            'timestamp': datetime.now().isoformat(),
             'funds': {
                 'available_funds': available_funds,
                 'total_original_funds': total_original_funds,
@@ -327,77 +761,145 @@ def save_yesterday_history(stock_states: Dict[str, Dict], funds_config: Dict, ye
                 'total_holding_value': total_holding_value,
                 'total_profit': total_profit
             },
-            'stocks': stock_snapshots
+            'stocks': stock_snapshots,
+            'timestamp': datetime.now().isoformat(),
         }
         
-        # 保存历史数据（单个对象，不是数组）
-        with open(history_file, 'w', encoding='utf-8') as f:
-            json.dump(history_data, f, ensure_ascii=False, indent=2)
+        # 只序列化一次：内容（不含时间戳）与上次成功写入的相同则跳过写盘，否则直接写入这份字节串
+        data = json_dumps_bytes(history_data)
+        fingerprint = hashlib.blake2b(memoryview(data)[:data.rfind(b'"timestamp"')], digest_size=8).digest()
+        if _history_fingerprints.get(history_file) == fingerprint:
+            return
+        
+        # 保存历史数据（单个对象，不是数组），由后台线程写盘；写入成功后才记录指纹，失败的写入下次会重试
+        write_json_async(history_file, data, functools.partial(_history_fingerprints.__setitem__, history_file, fingerprint))
     except Exception as e:
         pass  # 静默失败
 
 
-def should_stop_updating() -> bool:
-    """判断是否应该停止更新（超过15:01）"""
-    now = datetime.now()
-    if now.hour > STOP_UPDATE_HOUR:
-        return True
-    if now.hour == STOP_UPDATE_HOUR and now.minute >= STOP_UPDATE_MINUTE:
-        return True
-    return False
+def _history_save_loop():
+    """后台保存线程：取出最新的待保存快照并保存，每次保存后等待 SAVE_DEBOUNCE_S 秒"""
+    global _history_save_pending
+    while True:
+        _history_save_wakeup.wait()
+        _history_save_wakeup.clear()
+        with _history_save_lock:
+            args, _history_save_pending = _history_save_pending, None
+        if args is not None:
+            with _history_save_io_lock:
+                save_yesterday_history(*args)
+        time.sleep(SAVE_DEBOUNCE_S)
 
 
-def is_trading_time(stock_code: str, market_hours_config: Dict) -> bool:
+def save_history_debounced(stock_states: Dict[str, Dict], funds_config: Dict, yesterday_close_cache: Dict[str, float], target_date: str, stock_arrays: Dict):
+    """请求后台线程保存当天历史数据（不阻塞轮询；频繁的请求会合并，只保存最新的一份）
+    
+    保存的是调用时的快照，调用方之后修改 stock_states / stock_arrays 不影响本次保存
+    """
+    global _history_save_pending, _history_save_thread
+    snapshot = (
+        {code: dict(state) for code, state in stock_states.items()},
+        dict(funds_config),
+        yesterday_close_cache,
+        target_date,
+        {key: (value.copy() if isinstance(value, np.ndarray) else value) for key, value in stock_arrays.items()},
+    )
+    with _history_save_lock:
+        _history_save_pending = snapshot
+        if _history_save_thread is None:
+            _history_save_thread = threading.Thread(target=_history_save_loop, name="history-save", daemon=True)
+            _history_save_thread.start()
+    _history_save_wakeup.set()
+
+
+def save_history_now(stock_states: Dict[str, Dict], funds_config: Dict, yesterday_close_cache: Dict[str, float], target_date: str, stock_arrays: Optional[Dict] = None):
+    """立即在当前线程保存历史数据（日期变化和程序退出时调用）
+    
+    后台尚未保存的旧快照直接丢弃；如果后台正在保存，等它完成后再保存，保证最终写入的是最新数据
+    """
+    global _history_save_pending
+    with _history_save_lock:
+        _history_save_pending = None
+    with _history_save_io_lock:
+        save_yesterday_history(stock_states, funds_config, yesterday_close_cache, target_date, stock_arrays)
+
+
+def compute_stop_deadline(now: Optional[datetime] = None) -> float:
+    """计算当天停止更新时间（15:01）对应的 time.monotonic() 时间戳（每天计算一次）"""
+    if now is None:
+        now = datetime.now()
+    stop_dt = now.replace(hour=STOP_UPDATE_HOUR, minute=STOP_UPDATE_MINUTE, second=0, microsecond=0)
+    return time.monotonic() + (stop_dt - now).total_seconds()
+
+
+def should_stop_updating(stop_deadline: float) -> bool:
+    """判断是否应该停止更新（超过15:01）
+    
+    :param stop_deadline: compute_stop_deadline 计算的当天截止时间戳
+    """
+    return time.monotonic() >= stop_deadline
+
+
+def parse_minute_of_day(time_str: str) -> int:
+    """把 "HH:MM" 转换为当天的分钟数（如 "09:30" -> 570）"""
+    hour, minute = time_str.split(':')
+    return int(hour) * 60 + int(minute)
+
+
+def compile_market_hours(market_hours_config: Dict) -> Dict[str, Optional[Dict]]:
+    """预处理市场交易时间配置（只在加载配置时计算一次）
+    
+    时间字符串转换为当天分钟数，每个交易时段预先判断是否跨日（如美股：22:30 - 05:00）
+    :param market_hours_config: 配置文件中的 market_hours
+    :return: {市场名称: None（未启用） 或 {'weekdays': 允许的星期集合, 'sessions': ((开始分钟, 结束分钟, 是否跨日), ...)}}
+    """
+    compiled: Dict[str, Optional[Dict]] = {}
+    for market_name, market_config in market_hours_config.items():
+        if not market_config or not market_config.get('enabled', False):
+            compiled[market_name] = None
+            continue
+        
+        sessions = []
+        for period_name, default_start, default_end in (('morning', '09:30', '11:30'), ('afternoon', '13:00', '15:00')):
+            period = market_config.get(period_name)
+            if period:
+                start = parse_minute_of_day(period.get('start', default_start))
+                end = parse_minute_of_day(period.get('end', default_end))
+                sessions.append((start, end, start > end))
+        
+        compiled[market_name] = {
+            'weekdays': frozenset(market_config.get('weekdays', [1, 2, 3, 4, 5])),
+            'sessions': tuple(sessions),
+        }
+    return compiled
+
+
+def is_trading_time(market_name: str, market_hours: Dict[str, Optional[Dict]], weekday: int, minute_of_day: int) -> bool:
     """判断当前时间是否在交易时间内
     
-    :param stock_code: 股票代码
-    :param market_hours_config: 市场交易时间配置
+    :param market_name: 股票所属市场（"A股"/"美股"，见 get_stock_market_info）
+    :param market_hours: compile_market_hours 预处理后的市场交易时间配置
+    :param weekday: 当前星期（1-7，1是周一）
+    :param minute_of_day: 当前时间的当天分钟数（时*60+分）
     :return: 是否在交易时间内
     """
-    # 判断股票所属市场
-    if is_us_stock(stock_code):
-        market_name = "美股"
-    else:
-        market_name = "A股"
-    
-    # 获取市场配置
-    market_config = market_hours_config.get(market_name, {})
-    if not market_config.get('enabled', False):
+    market = market_hours.get(market_name)
+    if market is None:
         # 如果市场未启用，默认允许交易（向后兼容）
         return True
     
     # 检查是否为工作日
-    now = datetime.now()
-    weekday = now.weekday() + 1  # Python的weekday()返回0-6，0是周一，需要转换为1-7
-    allowed_weekdays = market_config.get('weekdays', [1, 2, 3, 4, 5])
-    if weekday not in allowed_weekdays:
+    if weekday not in market['weekdays']:
         return False
     
-    # 获取当前时间（时:分）
-    current_time = now.strftime("%H:%M")
-    
-    # 检查上午交易时间
-    morning = market_config.get('morning')
-    if morning:
-        morning_start = morning.get('start', '09:30')
-        morning_end = morning.get('end', '11:30')
-        # 处理跨日交易（如美股：22:30 - 05:00）
-        if morning_start > morning_end:
+    # 检查上午/下午交易时间
+    for start, end, wraps in market['sessions']:
+        if wraps:
             # 跨日交易：从晚上到第二天早上
-            if current_time >= morning_start or current_time <= morning_end:
+            if minute_of_day >= start or minute_of_day <= end:
                 return True
-        else:
+        elif start <= minute_of_day <= end:
             # 正常交易：同一天内
-            if morning_start <= current_time <= morning_end:
-                return True
-    
-    # 检查下午交易时间
-    afternoon = market_config.get('afternoon')
-    if afternoon:
-        afternoon_start = afternoon.get('start', '13:00')
-        afternoon_end = afternoon.get('end', '15:00')
-        # 下午交易时间通常不会跨日
-        if afternoon_start <= current_time <= afternoon_end:
             return True
     
     return False
@@ -408,184 +910,516 @@ def is_us_stock(stock_code: str) -> bool:
     return stock_code.isalpha() and len(stock_code) >= 1 and len(stock_code) <= 5
 
 
-def get_realtime_price(stock_code: str, yesterday_close_cache: Dict[str, float]) -> Optional[Tuple[float, str, float, str]]:
+def get_stock_market_info(stock_code: str) -> Tuple[bool, str, str]:
+    """判断股票所属市场（结果在初始化时存入 stock_states，避免每次轮询重复计算）
+    
+    :param stock_code: 股票代码
+    :return: (是否为美股, 带市场前缀的代码（美股为代码本身）, 市场名称)
+    """
+    if is_us_stock(stock_code):
+        return True, stock_code, "美股"
+    code_with_prefix = f"sz{stock_code}" if stock_code.startswith(('00', '30')) else f"sh{stock_code}"
+    return False, code_with_prefix, "A股"
+
+
+def check_rate_limited(resp: requests.Response) -> bool:
+    """检查响应是否表示被限流（429/503）；是则按 Retry-After 暂停所有逐个获取行情的请求
+    
+    :return: 是否被限流
+    """
+    if resp.status_code not in RATE_LIMIT_STATUS_CODES:
+        return False
+    pause = RATE_LIMIT_PAUSE
+    retry_after = resp.headers.get('Retry-After')
+    if retry_after:
+        try:
+            pause = _http_retry.parse_retry_after(retry_after)
+        except Exception:
+            pass  # 无法解析时使用默认暂停时间
+    _request_bucket.pause(min(pause, MAX_RATE_LIMIT_PAUSE))
+    return True
+
+
+def fetch_quote_em(code_with_prefix: str) -> Optional[Dict]:
+    """通过共享会话直接请求东方财富单股行情接口（A股）
+    
+    :param code_with_prefix: 带市场前缀的代码（如sz002255）
+    :return: {'price': 最新价, 'name': 股票简称, 'yesterday_close': 昨收} 或 None
+    """
+    market_code = 1 if code_with_prefix.startswith('sh') else 0
+    params = {
+        'fltt': '2',
+        'invt': '2',
+        'fields': 'f43,f57,f58,f60',  # 最新价、代码、简称、昨收
+        'secid': f"{market_code}.{code_with_prefix[2:]}",
+    }
+    resp = _session.get(EM_QUOTE_URL, params=params, timeout=HTTP_TIMEOUT)
+    if check_rate_limited(resp):
+        return None
+    data = json_loads(resp.content).get('data')
+    if not data:
+        return None
+    
+    price = data.get('f43')
+    # 停牌或无数据时接口返回 "-"
+    if not isinstance(price, (int, float)):
+        return None
+    yesterday_close = data.get('f60')
+    return {
+        'price': float(price),
+        'name': data.get('f58') or code_with_prefix,
+        'yesterday_close': float(yesterday_close) if isinstance(yesterday_close, (int, float)) and yesterday_close > 0 else None,
+    }
+
+
+def fetch_quote_xq(symbol: str, default_name: str) -> Optional[Tuple[object, str, object]]:
+    """通过共享会话直接请求雪球行情JSON接口（支持A股和美股）
+    
+    直接解析JSON，跳过akshare的DataFrame构造；只有返回内容解析失败时才回退到akshare
+    :param symbol: 雪球代码（A股带市场前缀如sz002255，美股直接用代码如TSLA）
+    :param default_name: 接口没有返回名称时使用的默认名称
+    :return: (现价, 股票名称, 昨收) 原始值，或 None
+    """
+    headers = {
+        'cookie': f"xq_a_token={XQ_A_TOKEN};",
+        'User-Agent': XQ_USER_AGENT,
+    }
+    resp = _session.get(XQ_QUOTE_URL, params={'symbol': symbol.upper(), 'extend': 'detail'}, headers=headers, timeout=HTTP_TIMEOUT)
+    if check_rate_limited(resp):
+        return None  # 被限流时不再通过akshare请求同一个服务器
+    try:
+        quote = json_loads(resp.content)['data']['quote']
+        # 未知或退市代码返回 "quote": null，交给akshare回退处理
+        if isinstance(quote, dict):
+            return quote.get('current'), quote.get('name') or default_name, quote.get('last_close')
+    except (KeyError, TypeError, ValueError):
+        pass
+    
+    # 回退：使用akshare接口
+    df = ak.stock_individual_spot_xq(symbol=symbol, timeout=3)
+    if df is None or df.empty:
+        return None
+    # 检查返回格式：可能是item-value格式或直接是DataFrame
+    if 'item' in df.columns and 'value' in df.columns:
+        # item-value格式
+        full_data = dict(zip(df['item'].to_numpy(), df['value'].to_numpy()))
+        return full_data.get('现价') or full_data.get('最新'), full_data.get('名称', default_name), full_data.get('昨收')
+    if '现价' in df.columns:
+        # 直接DataFrame格式
+        stock_name = df.iloc[0].get('名称', default_name) if '名称' in df.columns else default_name
+        yesterday_close_value = df.iloc[0].get('昨收') if '昨收' in df.columns else None
+        return df.iloc[0]['现价'], stock_name, yesterday_close_value
+    return None
+
+
+def get_realtime_price(stock_code: str, yesterday_close_cache: Dict[str, float], is_us: bool, code_with_prefix: str) -> Optional[Tuple[float, str, float, str]]:
     """
     获取股票实时价格
     :param stock_code: 股票代码（如002255、TSLA）
     :param yesterday_close_cache: 昨收价缓存字典
+    :param is_us: 是否为美股（预先计算，见 get_stock_market_info）
+    :param code_with_prefix: 带市场前缀的代码（预先计算，见 get_stock_market_info）
     :return: (价格, 股票名称, 昨收价, 更新时间) 或 None
     """
     try:
-        # 获取昨天的日期字符串（用于缓存文件）
-        yesterday_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-        
-        # 判断是否为美股
-        is_us = is_us_stock(stock_code)
-        
-        if is_us:
-            # 美股：使用雪球接口（雪球支持美股）
-            try:
-                # 美股代码直接使用，不需要前缀
-                df = ak.stock_individual_spot_xq(symbol=stock_code, timeout=3)
-                if df is not None and not df.empty:
-                    # 雪球返回的是item-value格式的DataFrame
-                    full_data = {}
-                    for _, row in df.iterrows():
-                        full_data[row['item']] = row['value']
-                    
-                    # 获取现价
-                    price_value = full_data.get('现价') or full_data.get('最新')
-                    if price_value:
-                        current_price = float(price_value)
-                        current_time = datetime.now()
-                        
-                        # 获取股票名称
-                        stock_name = full_data.get('名称', stock_code)
-                        
-                        # 获取昨收价
-                        yesterday_close = yesterday_close_cache.get(stock_code)
-                        if yesterday_close is None:
-                            file_cache = load_yesterday_close_cache(yesterday_date)
-                            yesterday_close = file_cache.get(stock_code)
-                            if yesterday_close is None:
-                                # 从接口获取昨收
-                                yesterday_close_value = full_data.get('昨收')
-                                if yesterday_close_value:
-                                    yesterday_close = float(yesterday_close_value)
-                                    yesterday_close_cache[stock_code] = yesterday_close
-                                    file_cache[stock_code] = yesterday_close
-                                    save_yesterday_close_cache(file_cache, yesterday_date)
-                                else:
-                                    yesterday_close = current_price
-                        
-                        # 格式化为 H:i:s.ms
-                        update_time = current_time.strftime("%H:%M:%S") + f".{current_time.microsecond // 1000:03d}"
-                        return current_price, stock_name, yesterday_close, update_time
-            except:
-                pass
-        else:
-            # A股：使用原有逻辑
-            code_with_prefix = f"sz{stock_code}" if stock_code.startswith(('00', '30')) else f"sh{stock_code}"
-            
-            # 方法1：使用东方财富单个股票接口
+        if not is_us:
+            # A股方法1：使用东方财富单个股票接口（共享会话直接请求）
             try:
-                df = ak.stock_individual_info_em(symbol=stock_code, timeout=3)
+                quote = fetch_quote_em(code_with_prefix)
                 
-                if not df.empty:
-                    full_data = {}
-                    for _, row in df.iterrows():
-                        full_data[row['item']] = row['value']
+                if quote:
+                    current_price = quote['price']
+                    current_time = datetime.now()
                     
-                    price_row = df[df['item'] == '最新']
-                    if not price_row.empty:
-                        current_price = float(price_row.iloc[0]['value'])
-                        current_time = datetime.now()
-                        
-                        # 获取股票名称
-                        name_row = df[df['item'] == '股票简称']
-                        stock_name = name_row.iloc[0]['value'] if not name_row.empty else code_with_prefix
-                        
-                        # 获取昨收价（优先从缓存，缓存没有则从文件，文件没有则联网获取）
-                        yesterday_close = yesterday_close_cache.get(stock_code)
-                        
-                        if yesterday_close is None:
-                            # 从文件加载缓存（使用昨天的日期）
-                            file_cache = load_yesterday_close_cache(yesterday_date)
-                            yesterday_close = file_cache.get(stock_code)
-                            
-                            if yesterday_close is None:
-                                # 文件也没有，联网获取
-                                try:
-                                    spot_df = ak.stock_zh_a_spot_em()
-                                    stock_row = spot_df[spot_df['代码'] == stock_code]
-                                    if not stock_row.empty and '昨收' in stock_row.columns:
-                                        yesterday_close = float(stock_row.iloc[0]['昨收'])
-                                        # 更新内存缓存和文件缓存
-                                        yesterday_close_cache[stock_code] = yesterday_close
-                                        file_cache[stock_code] = yesterday_close
-                                        save_yesterday_close_cache(file_cache, yesterday_date)
-                                except:
-                                    pass
-                        
-                        # 如果还是没有找到昨收，使用当前价格
-                        if yesterday_close is None:
-                            yesterday_close = current_price
-                        
-                        # 格式化为 H:i:s.ms
-                        update_time = current_time.strftime("%H:%M:%S") + f".{current_time.microsecond // 1000:03d}"
-                        return current_price, stock_name, yesterday_close, update_time
+                    # 获取股票名称
+                    stock_name = quote['name']
+                    
+                    # 获取昨收价（缓存在启动时已从文件加载，这里只查内存，没有则使用接口返回的昨收）
+                    yesterday_close = yesterday_close_cache.get(stock_code)
+                    if yesterday_close is None and quote['yesterday_close'] is not None:
+                        yesterday_close = quote['yesterday_close']
+                        remember_yesterday_close(stock_code, yesterday_close, yesterday_close_cache)
+                    
+                    # 如果还是没有找到昨收，使用当前价格
+                    if yesterday_close is None:
+                        yesterday_close = current_price
+                    
+                    # 格式化为 H:i:s.ms
+                    update_time = current_time.strftime("%H:%M:%S") + f".{current_time.microsecond // 1000:03d}"
+                    return current_price, stock_name, yesterday_close, update_time
             except:
                 pass
-            
-            # 方法2：使用雪球接口（备用）
-            try:
-                df = ak.stock_individual_spot_xq(symbol=code_with_prefix, timeout=3)
-                if df is not None and not df.empty:
-                    # 检查返回格式：可能是item-value格式或直接是DataFrame
-                    if 'item' in df.columns and 'value' in df.columns:
-                        # item-value格式
-                        full_data = {}
-                        for _, row in df.iterrows():
-                            full_data[row['item']] = row['value']
-                        price_value = full_data.get('现价') or full_data.get('最新')
-                        stock_name = full_data.get('名称', code_with_prefix)
-                        yesterday_close_value = full_data.get('昨收')
-                    else:
-                        # 直接DataFrame格式
-                        if '现价' in df.columns:
-                            price_value = df.iloc[0]['现价']
-                            stock_name = df.iloc[0].get('名称', code_with_prefix) if '名称' in df.columns else code_with_prefix
-                            yesterday_close_value = df.iloc[0].get('昨收') if '昨收' in df.columns else None
+        
+        # 美股：使用雪球接口（雪球支持美股，代码直接使用，不需要前缀）
+        # A股方法2：使用雪球接口（备用）
+        try:
+            xq_symbol = stock_code if is_us else code_with_prefix
+            quote = fetch_quote_xq(xq_symbol, xq_symbol)
+            if quote:
+                price_value, stock_name, yesterday_close_value = quote
+                if price_value:
+                    current_price = float(price_value)
+                    current_time = datetime.now()
+                    
+                    # 获取昨收价（缓存在启动时已从文件加载，这里只查内存，没有则使用接口返回的昨收）
+                    yesterday_close = yesterday_close_cache.get(stock_code)
+                    if yesterday_close is None:
+                        if yesterday_close_value:
+                            yesterday_close = float(yesterday_close_value)
+                            remember_yesterday_close(stock_code, yesterday_close, yesterday_close_cache)
                         else:
-                            price_value = None
-                            stock_name = code_with_prefix
-                            yesterday_close_value = None
+                            yesterday_close = current_price
                     
-                    if price_value:
-                        current_price = float(price_value)
-                        current_time = datetime.now()
-                        
-                        yesterday_close = yesterday_close_cache.get(stock_code)
-                        if yesterday_close is None:
-                            file_cache = load_yesterday_close_cache(yesterday_date)
-                            yesterday_close = file_cache.get(stock_code)
-                            if yesterday_close is None:
-                                if yesterday_close_value:
-                                    yesterday_close = float(yesterday_close_value)
-                                    yesterday_close_cache[stock_code] = yesterday_close
-                                    file_cache[stock_code] = yesterday_close
-                                    save_yesterday_close_cache(file_cache, yesterday_date)
-                                else:
-                                    yesterday_close = current_price
-                        
-                        # 格式化为 H:i:s.ms
-                        update_time = current_time.strftime("%H:%M:%S") + f".{current_time.microsecond // 1000:03d}"
-                        return current_price, stock_name, yesterday_close, update_time
-            except:
-                pass
+                    # 格式化为 H:i:s.ms
+                    update_time = current_time.strftime("%H:%M:%S") + f".{current_time.microsecond // 1000:03d}"
+                    return current_price, stock_name, yesterday_close, update_time
+        except:
+            pass
         
         return None
     except:
         return None
 
 
-def format_price(price: Optional[float]) -> str:
-    """格式化价格：保留3位小数，去掉末尾的0"""
+def _fetch_tencent_fields(stock_codes: List[str], stock_states: Dict[str, Dict]) -> Dict[str, List[str]]:
+    """通过腾讯行情接口一次请求获取所有股票的原始行情字段
+    
+    返回格式：v_sh600000="1~浦发银行~600000~8.45~8.44~..."; v_usAAPL="200~苹果~AAPL.OQ~...";
+    :return: {股票代码: 按 ~ 拆分后的字段列表}（无效代码不在返回结果中）
+    """
+    # 腾讯接口代码：A股为带前缀的代码，美股为 us + 大写代码
+    symbol_to_code = {
+        f"us{code.upper()}" if stock_states[code]['is_us'] else stock_states[code]['prefixed']: code
+        for code in stock_codes
+    }
+    resp = _session.get(TENCENT_QUOTE_URL + ','.join(symbol_to_code), timeout=BATCH_QUOTE_TIMEOUT)
+    text = resp.content.decode('gbk', errors='ignore')
+    
+    fields: Dict[str, List[str]] = {}
+    for line in text.split(';'):
+        line = line.strip()
+        if not line.startswith('v_'):
+            continue
+        symbol, _, body = line[2:].partition('="')
+        code = symbol_to_code.get(symbol)
+        if code is None:
+            continue  # 无效代码返回 v_pv_none_match
+        fields[code] = body.rstrip('"').split('~')
+    return fields
+
+
+def _tencent_float(parts: List[str], i: int) -> Optional[float]:
+    """读取腾讯行情的第 i 个字段并转换为float，字段缺失或无法转换返回None"""
+    try:
+        return float(parts[i])
+    except (IndexError, ValueError):
+        return None
+
+
+def fetch_quotes_tencent(stock_codes: List[str], stock_states: Dict[str, Dict]) -> Dict[str, Tuple[float, str, Optional[float]]]:
+    """通过腾讯行情接口一次请求获取所有股票的行情
+    
+    数据格式：状态~名称~代码~当前价~昨收~...
+    :return: {股票代码: (当前价, 股票名称, 昨收)}
+    """
+    quotes: Dict[str, Tuple[float, str, Optional[float]]] = {}
+    for code, parts in _fetch_tencent_fields(stock_codes, stock_states).items():
+        price = _tencent_float(parts, 3)
+        if price is None or price <= 0:
+            continue  # 停牌或无数据
+        yesterday_close = _tencent_float(parts, 4)
+        quotes[code] = (price, parts[1] or code, yesterday_close if yesterday_close and yesterday_close > 0 else None)
+    return quotes
+
+
+def fetch_a_share_klines_tencent(stock_codes: List[str], stock_states: Dict[str, Dict]) -> Dict[str, Dict]:
+    """通过腾讯行情接口一次请求获取A股当日K线数据（开/收/高/低/成交量/成交额）
+    
+    数据格式：...~当前价(3)~昨收(4)~今开(5)~...~最高(33)~最低(34)~...~成交量(36，单位手)~成交额(37，单位万元)~...
+    :return: {股票代码: {'open', 'close', 'high', 'low', 'volume', 'amount'}}，停牌或无数据的股票不在返回结果中
+    """
+    klines: Dict[str, Dict] = {}
+    for code, parts in _fetch_tencent_fields(stock_codes, stock_states).items():
+        close = _tencent_float(parts, 3)
+        if close is None or close <= 0:
+            continue  # 停牌或无数据
+        volume = _tencent_float(parts, 36)
+        amount = _tencent_float(parts, 37)
+        klines[code] = {
+            'open': _tencent_float(parts, 5),
+            'close': close,
+            'high': _tencent_float(parts, 33),
+            'low': _tencent_float(parts, 34),
+            'volume': volume * 100 if volume is not None else None,  # 手换算为股
+            'amount': amount * 10000 if amount is not None else None,  # 万元换算为元
+        }
+    return klines
+
+
+def get_realtime_prices_batch(stock_codes: List[str], stock_states: Dict[str, Dict], yesterday_close_cache: Dict[str, float]) -> Dict[str, Tuple[float, str, float, str]]:
+    """一次批量请求获取多个股票的实时价格（请求失败或缺失的股票不在返回结果中）
+    
+    :return: {股票代码: 与 get_realtime_price 格式一致的返回值}
+    """
+    try:
+        quotes = fetch_quotes_tencent(stock_codes, stock_states)
+    except Exception:
+        return {}
+    results = {}
+    for code in stock_codes:
+        result = get_price_from_snapshot(code, quotes, yesterday_close_cache)
+        if result:
+            results[code] = result
+    return results
+
+
+def get_price_from_snapshot(stock_code: str, snapshot: Dict[str, Tuple[float, str, Optional[float]]], yesterday_close_cache: Dict[str, float]) -> Optional[Tuple[float, str, float, str]]:
+    """从批量行情（fetch_quotes_tencent 的返回值）中读取股票价格，返回格式与 get_realtime_price 一致"""
+    quote = snapshot.get(stock_code)
+    if quote is None:
+        return None
+    
+    current_price, stock_name, snapshot_yesterday_close = quote
+    current_time = datetime.now()
+    
+    # 获取昨收价（优先从缓存，缓存没有则使用快照中的昨收）
+    yesterday_close = yesterday_close_cache.get(stock_code)
+    if yesterday_close is None:
+        if snapshot_yesterday_close:
+            yesterday_close = snapshot_yesterday_close
+            remember_yesterday_close(stock_code, yesterday_close, yesterday_close_cache)
+        else:
+            yesterday_close = current_price
+    
+    # 格式化为 H:i:s.ms
+    update_time = current_time.strftime("%H:%M:%S") + f".{current_time.microsecond // 1000:03d}"
+    return current_price, stock_name, yesterday_close, update_time
+
+
+class TokenBucket:
+    """令牌桶限流（线程安全）：平均每秒最多 rate 个请求，最多允许 capacity 个请求同时发出
+    
+    时间间隔使用 time.monotonic() 计算，不受系统时间调整（NTP校时等）影响
+    """
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self.paused_until = float('-inf')
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+    
+    def acquire(self):
+        """取出一个令牌，令牌不足或暂停中时等待（等待后加随机延迟，避免被识别为机器人）
+        
+        :raises RuntimeError: 令牌桶已关闭（程序退出中）
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait_time = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                    self.last_refill = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait_time = (1 - self.tokens) / self.rate
+            if self.closed.wait(wait_time + random.uniform(0, MAX_RANDOM_DELAY)):
+                raise RuntimeError("令牌桶已关闭")
+    
+    def pause(self, seconds: float):
+        """暂停发放令牌 seconds 秒（被服务端限流时调用），暂停结束后从空桶开始重新积累令牌"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+            self.last_refill = self.paused_until
+    
+    def close(self):
+        """关闭令牌桶：正在等待令牌的线程立即退出（程序退出时调用）"""
+        self.closed.set()
+
+
+# 防封禁：所有逐个获取行情的请求共享一个令牌桶，平均每 MIN_REQUEST_INTERVAL 秒一个请求
+_request_bucket = TokenBucket(rate=1 / MIN_REQUEST_INTERVAL, capacity=MAX_FETCH_WORKERS)
+
+# 逐个获取行情的线程池（只创建一次，每轮轮询复用线程）
+_fetch_executor = ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS, thread_name_prefix="quote-fetch")
+# 线程池中尚未完成的请求：{股票代码: Future}，上一次请求没完成的股票不重复提交（只在主线程中读写）
+_inflight_fetches: Dict[str, Future] = {}
+
+
+def shutdown_fetch_executor():
+    """程序退出前取消线程池中排队未开始的请求，唤醒正在等待令牌的请求，不等待正在执行的请求"""
+    _request_bucket.close()
+    _fetch_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_realtime_price_throttled(stock_code: str, yesterday_close_cache: Dict[str, float], is_us: bool, code_with_prefix: str) -> Optional[Tuple[float, str, float, str]]:
+    """带请求限流的 get_realtime_price（供线程池调用）"""
+    _request_bucket.acquire()
+    return get_realtime_price(stock_code, yesterday_close_cache, is_us, code_with_prefix)
+
+
+def fetch_realtime_prices(stock_codes: List[str], stock_states: Dict[str, Dict], yesterday_close_cache: Dict[str, float]) -> Dict[str, Optional[Tuple[float, str, float, str]]]:
+    """获取多个股票的实时价格
+    
+    所有股票先通过腾讯接口一次批量请求；批量结果中缺失的股票（停牌、代码前缀错误、批量请求失败等）：
+    线程池并发逐个获取（网络IO密集，耗时约为最慢的单次请求而非总和）
+
+    :param stock_codes: 股票代码列表
+    :param stock_states: 股票状态字典（读取预先计算的市场分类）
+    :param yesterday_close_cache: 昨收价缓存字典
+    :return: {股票代码: get_realtime_price 的返回值}
+    """
+    results: Dict[str, Optional[Tuple[float, str, float, str]]] = {}
+    if not stock_codes:
+        return results
+
+    # 一次批量请求获取所有股票
+    results.update(get_realtime_prices_batch(stock_codes, stock_states, yesterday_close_cache))
+    pending_codes = [c for c in stock_codes if c not in results]
+    if not pending_codes:
+        return results
+
+    futures: Dict[Future, str] = {}
+    for c in pending_codes:
+        previous = _inflight_fetches.get(c)
+        if previous is not None and not previous.done():
+            # 上一轮超时的请求仍在执行：本轮不重复提交也不等待，视为获取失败
+            results[c] = None
+            continue
+        fut = _fetch_executor.submit(get_realtime_price_throttled, c, yesterday_close_cache, stock_states[c]['is_us'], stock_states[c]['prefixed'])
+        _inflight_fetches[c] = fut
+        futures[fut] = c
+    if not futures:
+        return results
+
+    try:
+        for fut in as_completed(futures, timeout=FETCH_TIMEOUT):
+            try:
+                results[futures[fut]] = fut.result()
+            except Exception:
+                results[futures[fut]] = None
+    except FuturesTimeoutError:
+        # 超时未完成的请求本轮视为获取失败：还在排队的直接取消，正在执行的留在后台完成（下一轮不重复提交）
+        for fut, code in futures.items():
+            if code not in results:
+                results[code] = None
+                fut.cancel()
+    for fut, code in futures.items():
+        if fut.done():
+            del _inflight_fetches[code]
+    return results
+
+
+@functools.lru_cache(maxsize=4096)
+def _fmt(price: Optional[float], fixed: bool) -> str:
+    """格式化价格（带缓存：两次刷新之间大部分股票价格不变，直接复用格式化结果）"""
     if price is None:
         return "--"
+    if fixed:
+        return f"{price:.2f}"
     # 格式化为3位小数，然后去掉末尾的0
     formatted = f"{price:.3f}"
     # 去掉末尾的0，如果小数点后全为0，也去掉小数点
     return formatted.rstrip('0').rstrip('.')
 
 
+def format_price(price: Optional[float]) -> str:
+    """格式化价格：保留3位小数，去掉末尾的0"""
+    return _fmt(price, False)
+
+
 def format_price_fixed(price: Optional[float]) -> str:
     """格式化价格：固定两位小数，不trim掉0（用于现价和成本价显示）"""
-    if price is None:
-        return "--"
-    return f"{price:.2f}"
+    return _fmt(price, True)
+
+
+# 表格和统计信息使用的样式（模块加载时解析一次，每帧复用）
+STYLE_UP_ON_BLUE = Style.parse("bold red on blue")  # 涨（红）
+STYLE_DOWN_ON_BLUE = Style.parse("bold green on blue")  # 跌（绿）
+STYLE_FLAT_ON_BLUE = Style.parse("white on blue")  # 平
+STYLE_UP = Style.parse("bold red")
+STYLE_DOWN = Style.parse("bold green")
+STYLE_WHITE = Style.parse("white")
+STYLE_BOLD_WHITE = Style.parse("bold white")
+STYLE_HEADER = Style.parse("bold white on blue")
+STYLE_BORDER = Style.parse("blue")
+TABLE_ROW_STYLES = [Style.parse("white on blue"), Style.parse("white on bright_blue")]
+
+# 表格列定义：(标题, 宽度, 对齐方式)
+TABLE_COLUMNS = (
+    ("名称", 14, "left"),
+    ("代码", 10, "left"),
+    ("现价", 8, "right"),
+    ("涨跌幅", 8, "right"),
+    ("成本价", 8, "right"),
+    ("数量", 8, "right"),
+    ("盈亏", 20, "right"),
+    ("时间", 14, "right"),
+)
+
+
+def _make_table() -> Table:
+    """创建空的股票表格（使用蓝色背景和白色文字，文字颜色统一为白色，涨跌比单独处理）"""
+    table = Table(
+        show_header=True,
+        header_style=STYLE_HEADER,
+        box=ROUNDED,
+        border_style=STYLE_BORDER,
+        row_styles=TABLE_ROW_STYLES,
+        padding=(0, 1)
+    )
+    for title, width, justify in TABLE_COLUMNS:
+        table.add_column(title, style=STYLE_WHITE, width=width, header_style=STYLE_HEADER, justify=justify)
+    return table
+
+
+@functools.lru_cache(maxsize=4096)
+def _fmt_pct(pct: float, sign: int) -> str:
+    """格式化涨跌幅/盈亏百分比（带缓存）
+    
+    :param pct: 保留两位小数后的绝对值（缓存键，不区分 0.0 和 -0.0）
+    :param sign: 原始值的符号（1/0/-1），保证 -0.001% 显示为 -0.00%
+    """
+    return f"{'-' if sign < 0 else '+'}{pct:.2f}%"
+
+
+def _pct_cache_key(pct: float) -> Tuple[float, int]:
+    """百分比的缓存键：(保留两位小数后的绝对值, 原始值的符号)，限制缓存大小且不丢失符号"""
+    return round(abs(pct), 2) + 0.0, (pct > 0) - (pct < 0)
+
+
+def format_pct(pct: float) -> str:
+    """格式化百分比：带符号、两位小数（先保留两位小数再查缓存，限制缓存大小）"""
+    return _fmt_pct(*_pct_cache_key(pct))
+
+
+@functools.lru_cache(maxsize=256)
+def _styled_pct(pct: float, sign: int) -> Text:
+    """生成带颜色的涨跌幅文本（带缓存，返回的Text不能修改）：红涨绿跌（中国股市标准），在蓝色背景上显示
+    
+    颜色按原始值的符号选择，不足0.01%的涨跌也显示颜色
+    """
+    if sign > 0:
+        style = STYLE_UP_ON_BLUE
+    elif sign < 0:
+        style = STYLE_DOWN_ON_BLUE
+    else:
+        style = STYLE_FLAT_ON_BLUE
+    return Text(_fmt_pct(pct, sign), style=style)
 
 
+def styled_change_pct(pct: float) -> Text:
+    """表格中带颜色的涨跌幅单元格（先保留两位小数再查缓存）"""
+    return _styled_pct(*_pct_cache_key(pct))
+
+
+@functools.lru_cache(maxsize=4096)
 def format_privacy_value(value, privacy_mode: bool) -> str:
     """根据隐私模式格式化显示值
     
@@ -600,17 +1434,14 @@ def format_privacy_value(value, privacy_mode: bool) -> str:
     return str(value)
 
 
+@functools.lru_cache(maxsize=1024)
 def get_stock_name(stock_code: str) -> str:
-    """获取股票名称（用于显示，默认显示代码）"""
-    if is_us_stock(stock_code):
-        return stock_code  # 美股直接返回代码
-    else:
-        code_with_prefix = f"sz{stock_code}" if stock_code.startswith(('00', '30')) else f"sh{stock_code}"
-        return code_with_prefix
+    """获取股票默认名称（还没有获取到行情名称时显示；美股直接返回代码，A股返回带前缀的代码）"""
+    return get_stock_market_info(stock_code)[1]
 
 
-def play_alert_sound():
-    """播放报警声音"""
+def _play_alert_sound_blocking():
+    """播放报警声音（阻塞约500ms，只在报警声音线程中调用）"""
     try:
         if os.name == 'nt':  # Windows
             import winsound
@@ -626,47 +1457,131 @@ def play_alert_sound():
         print('\a', end='', flush=True)
 
 
-def check_price_alert(stock_code: str, current_price: float, stock_states: Dict[str, Dict]):
-    """检查价格是否触发报警
+def _alert_sound_loop():
+    """报警声音线程：每秒最多播放一次，冷却期间的重复请求直接合并"""
+    while True:
+        _alert_queue.get()
+        _play_alert_sound_blocking()
+        time.sleep(1)
+        # 丢弃冷却期间积压的请求
+        try:
+            _alert_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+
+def play_alert_sound():
+    """播放报警声音（异步，不阻塞轮询；同一时刻多只股票报警只响一次）"""
+    global _alert_thread
+    with _alert_thread_lock:
+        if _alert_thread is None:
+            _alert_thread = threading.Thread(target=_alert_sound_loop, name="alert-sound", daemon=True)
+            _alert_thread.start()
+    try:
+        _alert_queue.put_nowait(1)
+    except queue.Full:
+        pass
+
+
+# 报警消息的ANSI转义码（闪烁 + 颜色），模块加载时拼接一次
+ALERT_UP_PREFIX = "\033[5m\033[93m"  # 闪烁 + 黄色
+ALERT_DOWN_PREFIX = "\033[5m\033[91m"  # 闪烁 + 红色
+ALERT_SUFFIX = "\033[0m"  # 恢复默认样式
+
+
+def print_alert(prefix: str, message: str):
+    """输出带终端闪烁效果的报警消息
     
-    :param stock_code: 股票代码
-    :param current_price: 当前价格
-    :param stock_states: 股票状态字典
-    :return: (是否触发上升报警, 是否触发下跌报警)
+    通过 print 写入 sys.stdout：rich Live界面运行时 stdout 被重定向，消息会显示在界面上方而不是打乱界面
     """
-    if stock_code not in stock_states:
-        return False, False
+    print(prefix + message + ALERT_SUFFIX, flush=True)
+
+
+def check_price_alerts(stock_arrays: Dict, idx: np.ndarray, current_prices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """批量检查价格是否触发报警（一次向量化比较所有股票），并原地更新报警触发标记
+    
+    - 当前价格 >= 上升报警价格：之前没有触发过，或者价格从低于报警价格变为高于等于报警价格时触发
+    - 当前价格 <= 下跌报警价格：之前没有触发过，或者价格从高于报警价格变为低于等于报警价格时触发
+    - 价格回到正常范围时重置报警标记（允许再次报警）
+    
+    :param stock_arrays: build_stock_arrays 生成的列式数组（'price' 为上次的价格，调用方在检查之后再更新）
+    :param idx: 本轮获取到价格的股票在数组中的下标
+    :param current_prices: 与 idx 对应的当前价格
+    :return: (是否触发上升报警的数组, 是否触发下跌报警的数组)，与 idx 一一对应
+    """
+    alert_up = stock_arrays['alert_up'][idx]
+    alert_down = stock_arrays['alert_down'][idx]
+    last_prices = stock_arrays['price'][idx]
+    triggered_up = stock_arrays['alert_triggered_up'][idx]
+    triggered_down = stock_arrays['alert_triggered_down'][idx]
+    
+    # 未配置报警价格（NaN）时比较结果都为False
+    up_hit = (current_prices >= alert_up) & (~triggered_up | (last_prices < alert_up))
+    down_hit = (current_prices <= alert_down) & (~triggered_down | (last_prices > alert_down))
+    
+    stock_arrays['alert_triggered_up'][idx] = (triggered_up | up_hit) & ~(current_prices < alert_up)
+    stock_arrays['alert_triggered_down'][idx] = (triggered_down | down_hit) & ~(current_prices > alert_down)
+    return up_hit, down_hit
+
+
+def get_stock_transactions(stock_info: Dict) -> List[Dict]:
+    """从JSON配置中读取持仓信息（新格式：transactions数组）"""
+    return stock_info.get('transactions', []) if isinstance(stock_info, dict) else []
+
+
+def parse_stock_alerts(stock_info: Dict) -> Tuple[Optional[float], Optional[float]]:
+    """读取报警价格配置
     
-    state = stock_states[stock_code]
-    alert_up = state.get('alert_up')
-    alert_down = state.get('alert_down')
+    :return: (上升报警价格, 下跌报警价格)，未配置为None
+    """
+    alert_up = stock_info.get('alert_up') if isinstance(stock_info, dict) else None
+    alert_down = stock_info.get('alert_down') if isinstance(stock_info, dict) else None
+    if alert_up is not None:
+        alert_up = float(alert_up)
+    if alert_down is not None:
+        alert_down = float(alert_down)
+    return alert_up, alert_down
+
+
+def stock_config_hash(stock_info: Dict) -> int:
+    """单个股票配置的哈希（重新加载配置时用于快速判断该股票的配置是否变化）"""
+    return hash(repr(stock_info))
+
+
+def build_stock_state(stock_code: str, stock_info: Dict) -> Dict:
+    """根据配置文件中单个股票的配置，构建该股票的初始状态
     
-    triggered_up = False
-    triggered_down = False
+    :param stock_code: 股票代码
+    :param stock_info: 配置文件 stocks 中该股票的配置（包含 transactions、alert_up、alert_down）
+    :return: 股票状态字典（价格相关字段为初始值）
+    """
+    transactions = get_stock_transactions(stock_info)
     
-    # 检查上升报警：当前价格 >= 报警价格
-    if alert_up is not None and current_price >= alert_up:
-        # 如果之前没有触发过，或者价格从低于报警价格变为高于等于报警价格
-        last_price = state.get('last_price')
-        if not state.get('alert_triggered_up', False) or (last_price is not None and last_price < alert_up):
-            triggered_up = True
-            state['alert_triggered_up'] = True
+    # 从transactions数组计算总数量和平均成本价
+    holding_quantity, holding_price = calculate_holding_from_transactions(transactions)
     
-    # 检查下跌报警：当前价格 <= 报警价格
-    if alert_down is not None and current_price <= alert_down:
-        # 如果之前没有触发过，或者价格从高于报警价格变为低于等于报警价格
-        last_price = state.get('last_price')
-        if not state.get('alert_triggered_down', False) or (last_price is not None and last_price > alert_down):
-            triggered_down = True
-            state['alert_triggered_down'] = True
+    # 读取报警价格配置
+    alert_up, alert_down = parse_stock_alerts(stock_info)
     
-    # 如果价格回到正常范围，重置报警标记（允许再次报警）
-    if alert_up is not None and current_price < alert_up:
-        state['alert_triggered_up'] = False
-    if alert_down is not None and current_price > alert_down:
-        state['alert_triggered_down'] = False
+    # 市场分类只计算一次
+    is_us, code_with_prefix, market_name = get_stock_market_info(stock_code)
     
-    return triggered_up, triggered_down
+    return {
+        'is_us': is_us,  # 是否为美股
+        'prefixed': code_with_prefix,  # 带市场前缀的代码
+        'market': market_name,  # 所属市场
+        'last_price': None,
+        'last_time': None,
+        'last_stock_name': None,  # 首次获取行情成功时设置，之前显示 get_stock_name 的默认名称
+        'last_update_time': '--',
+        'last_change_pct': 0.0,
+        'holding_price': holding_price if holding_quantity > 0 else None,  # 平均持仓成本价
+        'holding_quantity': holding_quantity,  # 持仓总数量
+        'transactions': transactions,  # 保存原始交易记录
+        'alert_up': alert_up,  # 上升报警价格
+        'alert_down': alert_down,  # 下跌报警价格
+        # 报警触发标记（避免重复报警）保存在列式数组 alert_triggered_up / alert_triggered_down 中
+    }
 
 
 def listen_stocks():
@@ -675,18 +1590,21 @@ def listen_stocks():
     yesterday_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
     # 加载昨收价缓存
     yesterday_close_cache = load_yesterday_close_cache(yesterday_date)
+    # 程序退出时保存尚未写盘的昨收价
+    atexit.register(flush_yesterday_close_cache, yesterday_close_cache, yesterday_date)
     
     # 加载持仓配置和资金配置
     config = load_holdings_config()
     funds_config = config.get('funds', {})
     stocks_config = config.get('stocks', {})
     privacy_mode = config.get('privacy_mode', False)  # 隐私模式配置
-    market_hours_config = config.get('market_hours', {})  # 市场交易时间配置
+    market_hours_config = compile_market_hours(config.get('market_hours', {}))  # 市场交易时间配置（已预处理为分钟数）
     
-    # 记录配置文件的最后修改时间
-    config_file_mtime = 0
-    if os.path.exists(HOLDINGS_CONFIG_FILE):
-        config_file_mtime = os.path.getmtime(HOLDINGS_CONFIG_FILE)
+    # 记录配置文件的变更标识 (修改时间, 文件大小) 和内容哈希
+    config_file_key = get_config_file_key()
+    config_content_hash = get_config_content_hash()
+    # 监听配置文件变更（未安装watchdog时回退到每轮检查修改时间）
+    config_watched = start_config_watcher()
     
     # 如果没有配置股票列表，提示错误
     if not stocks_config:
@@ -701,49 +1619,31 @@ def listen_stocks():
     total_original_funds = funds_config.get('total_original_funds', 0.0)
     
     # 为每个股票维护最后的价格
-    stock_states: Dict[str, Dict] = {}
-    for code in stock_codes:
-        # 从JSON配置中读取持仓信息（新格式：transactions数组）
-        stock_info = stocks_config.get(code, {})
-        transactions = stock_info.get('transactions', []) if isinstance(stock_info, dict) else []
-        
-        # 从transactions数组计算总数量和平均成本价
-        holding_quantity, holding_price = calculate_holding_from_transactions(transactions)
-        
-        # 读取报警价格配置
-        alert_up = stock_info.get('alert_up') if isinstance(stock_info, dict) else None
-        alert_down = stock_info.get('alert_down') if isinstance(stock_info, dict) else None
-        if alert_up is not None:
-            alert_up = float(alert_up)
-        if alert_down is not None:
-            alert_down = float(alert_down)
-        
-        stock_states[code] = {
-            'last_price': None,
-            'last_time': None,
-            'last_stock_name': get_stock_name(code),
-            'last_update_time': '--',
-            'last_change_pct': 0.0,
-            'holding_price': holding_price if holding_quantity > 0 else None,  # 平均持仓成本价
-            'holding_quantity': holding_quantity,  # 持仓总数量
-            'transactions': transactions,  # 保存原始交易记录
-            'alert_up': alert_up,  # 上升报警价格
-            'alert_down': alert_down,  # 下跌报警价格
-            'alert_triggered_up': False,  # 标记是否已触发上升报警（避免重复报警）
-            'alert_triggered_down': False,  # 标记是否已触发下跌报警（避免重复报警）
-        }
+    stock_states: Dict[str, Dict] = {code: build_stock_state(code, stocks_config.get(code, {})) for code in stock_codes}
+    # 每个股票配置的哈希，重新加载配置时只处理哈希变化的股票
+    stock_config_hashes: Dict[str, int] = {code: stock_config_hash(info) for code, info in stocks_config.items()}
     
     def reload_config_if_changed():
-        """检查配置文件是否被修改，如果修改则重新加载配置"""
+        """检查配置文件是否被修改，如果修改则重新加载配置
+        
+        只有 (修改时间, 文件大小) 和内容哈希都变化时才重新解析；
+        股票配置按代码比较，只更新新增/变化的股票，其他股票的价格和报警状态保持不变
+        """
         nonlocal config, funds_config, stocks_config, privacy_mode, market_hours_config
-        nonlocal stock_codes, available_funds, total_original_funds, config_file_mtime
+        nonlocal stock_codes, available_funds, total_original_funds, config_file_key, config_content_hash, stock_arrays, display_idx
+        nonlocal stock_config_hashes
         
-        if not os.path.exists(HOLDINGS_CONFIG_FILE):
-            return False
+        current_key = get_config_file_key()
+        if current_key is None or current_key == config_file_key:
+            return False  # 文件不存在或未修改
         
-        current_mtime = os.path.getmtime(HOLDINGS_CONFIG_FILE)
-        if current_mtime <= config_file_mtime:
-            return False  # 文件未修改
+        # 修改时间/大小变了，但内容没变（如 touch），不需要重新解析
+        current_hash = get_config_content_hash()
+        if current_hash is None:
+            return False
+        if current_hash == config_content_hash:
+            config_file_key = current_key
+            return False
         
         # 文件被修改了，重新加载配置
         try:
@@ -751,242 +1651,182 @@ def listen_stocks():
             new_funds_config = new_config.get('funds', {})
             new_stocks_config = new_config.get('stocks', {})
             new_privacy_mode = new_config.get('privacy_mode', False)
-            new_market_hours_config = new_config.get('market_hours', {})
+            new_market_hours_config = compile_market_hours(new_config.get('market_hours', {}))
             
-            # 更新配置
-            funds_config = new_funds_config
-            stocks_config = new_stocks_config
-            privacy_mode = new_privacy_mode
-            market_hours_config = new_market_hours_config
-            available_funds = funds_config.get('available_funds', 0.0)
-            total_original_funds = funds_config.get('total_original_funds', 0.0)
-            
-            # 更新股票代码列表
-            new_stock_codes = list(stocks_config.keys())
+            # 按每个股票配置的哈希比较新旧配置
+            new_hashes = {code: stock_config_hash(info) for code, info in new_stocks_config.items()}
+            added = new_hashes.keys() - stock_config_hashes.keys()
+            changed = {code for code, h in new_hashes.items() if code not in added and stock_config_hashes[code] != h}
+            holdings_changed = bool(added)
             
-            # 更新现有股票的持仓信息
-            for code in new_stock_codes:
-                stock_info = stocks_config.get(code, {})
-                transactions = stock_info.get('transactions', []) if isinstance(stock_info, dict) else []
-                holding_quantity, holding_price = calculate_holding_from_transactions(transactions)
-                
-                # 读取报警价格配置
-                alert_up = stock_info.get('alert_up') if isinstance(stock_info, dict) else None
-                alert_down = stock_info.get('alert_down') if isinstance(stock_info, dict) else None
-                if alert_up is not None:
-                    alert_up = float(alert_up)
-                if alert_down is not None:
-                    alert_down = float(alert_down)
-                
-                if code in stock_states:
-                    # 更新现有股票的持仓信息，保留价格数据
-                    stock_states[code]['holding_price'] = holding_price if holding_quantity > 0 else None
-                    stock_states[code]['holding_quantity'] = holding_quantity
-                    stock_states[code]['transactions'] = transactions
-                    # 更新报警价格配置
-                    stock_states[code]['alert_up'] = alert_up
-                    stock_states[code]['alert_down'] = alert_down
-                    # 重置报警标记（允许新配置触发报警）
-                    stock_states[code]['alert_triggered_up'] = False
-                    stock_states[code]['alert_triggered_down'] = False
-                else:
+            # 只处理新增/变化的股票
+            for code in added | changed:
+                stock_info = new_stocks_config[code]
+                state = stock_states.get(code)
+                if state is None:
                     # 新增股票，初始化状态
-                    stock_states[code] = {
-                        'last_price': None,
-                        'last_time': None,
-                        'last_stock_name': get_stock_name(code),
-                        'last_update_time': '--',
-                        'last_change_pct': 0.0,
-                        'holding_price': holding_price if holding_quantity > 0 else None,
-                        'holding_quantity': holding_quantity,
-                        'transactions': transactions,
-                        'alert_up': alert_up,
-                        'alert_down': alert_down,
-                        'alert_triggered_up': False,
-                        'alert_triggered_down': False,
-                    }
+                    stock_states[code] = build_stock_state(code, stock_info)
+                    continue
+                
+                # 更新现有股票的持仓信息，保留价格数据（交易记录变化时才重新计算持仓）
+                transactions = get_stock_transactions(stock_info)
+                if transactions != state['transactions']:
+                    holding_quantity, holding_price = calculate_holding_from_transactions(transactions)
+                    state['holding_price'] = holding_price if holding_quantity > 0 else None
+                    state['holding_quantity'] = holding_quantity
+                    state['transactions'] = transactions
+                    holdings_changed = True
+                # 更新报警价格配置
+                state['alert_up'], state['alert_down'] = parse_stock_alerts(stock_info)
             
             # 移除已删除的股票（可选：保留但不再更新，或者直接删除）
             # 这里选择保留已删除股票的数据，但不再更新
             # 如果需要完全移除，可以取消下面的注释
-            # removed_codes = set(stock_states.keys()) - set(new_stock_codes)
-            # for code in removed_codes:
+            # for code in stock_config_hashes.keys() - new_hashes.keys():
             #     del stock_states[code]
             
-            stock_codes = new_stock_codes
-            config_file_mtime = current_mtime
+            # 更新配置
+            config = new_config
+            funds_config = new_funds_config
+            stocks_config = new_stocks_config
+            privacy_mode = new_privacy_mode
+            market_hours_config = new_market_hours_config
+            available_funds = funds_config.get('available_funds', 0.0)
+            total_original_funds = funds_config.get('total_original_funds', 0.0)
+            stock_codes = list(stocks_config.keys())
+            active_codes_cache['key'] = None
+            config_file_key = current_key
+            config_content_hash = current_hash
+            stock_config_hashes = new_hashes
+            
+            if holdings_changed:
+                # 持仓或股票列表变化，重建列式数组（保留未变化股票的报警触发标记）
+                stock_arrays = build_stock_arrays(stock_states, stock_arrays)
+            # 更新变化股票的报警价格，并重置报警标记（允许新配置触发报警）
+            for code in added | changed:
+                i = stock_arrays['index'][code]
+                alert_up, alert_down = stock_states[code]['alert_up'], stock_states[code]['alert_down']
+                stock_arrays['alert_up'][i] = np.nan if alert_up is None else alert_up
+                stock_arrays['alert_down'][i] = np.nan if alert_down is None else alert_down
+                stock_arrays['alert_triggered_up'][i] = False
+                stock_arrays['alert_triggered_down'][i] = False
+            display_idx = np.array([stock_arrays['index'][code] for code in stock_codes], dtype=np.intp)
             
             return True  # 配置已更新
         except Exception as e:
             # 配置加载失败，不更新
             return False
     
-    last_request_time = 0
     console = Console()
-    initialized = False  # 标记是否已初始化完成
     
-    def generate_display():
-        """生成要显示的内容（从stock_states读取数据）"""
-        # 收集所有股票数据
-        stock_data_list = []
-        total_holding_value = 0.0  # 总持仓市值（用于计算总盈余）
+    # 显示缓存：每行的 (行签名, 单元格)，以及上一帧的签名和显示内容
+    row_cache: Dict[str, Tuple[tuple, tuple]] = {}
+    display_cache: Dict = {'key': None, 'renderable': None}
+    
+    def generate_display(current_time_str: str):
+        """生成要显示的内容（从stock_states读取数据）
         
-        for stock_code in stock_codes:
-            state = stock_states[stock_code]
-            if state['last_price'] is not None:
-                # 计算单只股票的盈余和持仓市值
-                profit = None
-                holding_value = None
-                # 持仓市值 = 当前股价 × 持仓数量（只要有持仓数量就计算）
-                if state['holding_quantity'] is not None and state['holding_quantity'] > 0:
-                    holding_value = state['last_price'] * state['holding_quantity']
-                    total_holding_value += holding_value
-                    # 如果有持仓价格，计算单只股票的盈亏
-                    if state['holding_price'] is not None:
-                        profit = (state['last_price'] - state['holding_price']) * state['holding_quantity']
-                
-                stock_data_list.append({
-                    'code': stock_code,
-                    'name': state['last_stock_name'],
-                    'price': state['last_price'],
-                    'change_pct': state['last_change_pct'],
-                    'holding_price': state['holding_price'],
-                    'holding_quantity': state['holding_quantity'],
-                    'profit': profit,
-                    'update_time': state['last_update_time']
-                })
-            else:
-                stock_data_list.append({
-                    'code': stock_code,
-                    'name': state['last_stock_name'],
-                    'price': None,
-                    'change_pct': None,
-                    'holding_price': state['holding_price'],
-                    'holding_quantity': state['holding_quantity'],
-                    'profit': None,
-                    'update_time': '--'
-                })
+        :param current_time_str: 当前时间字符串（由主循环每轮计算一次后传入）
+        """
+        # 按显示顺序取出列式数组，整体向量化计算持仓市值、盈亏和涨跌幅
+        price = stock_arrays['price'][display_idx]
+        qty = stock_arrays['qty'][display_idx]
+        cost = stock_arrays['cost'][display_idx]
+        chg = stock_arrays['chg'][display_idx]
+        has_price = ~np.isnan(price)
+        has_holding = has_price & (qty > 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # 持仓市值 = 当前股价 × 持仓数量（只要有持仓数量就计算）
+            holding_values = np.where(has_holding, price * qty, 0.0)
+            # 单只股票的盈亏（需要有持仓价格，否则为NaN）
+            profits = np.where(has_holding, (price - cost) * qty, np.nan)
+            # 盈亏百分比：盈亏金额 / 持仓成本 * 100
+            holding_costs = cost * qty
+            profit_pcts = np.where(holding_costs > 0, profits / holding_costs * 100, np.nan)
+        total_holding_value = float(holding_values.sum())  # 总持仓市值（用于计算总盈余）
         
-        # 计算整体涨跌比
-        valid_change_pcts = [d['change_pct'] for d in stock_data_list if d['change_pct'] is not None]
-        overall_change_pct = sum(valid_change_pcts) / len(valid_change_pcts) if valid_change_pcts else 0.0
+        # 计算整体涨跌比（只统计已获取到价格的股票，直接复用价格掩码，不再生成临时数组）
+        priced_count = int(np.count_nonzero(has_price))
+        overall_change_pct = float(np.sum(chg, where=has_price)) / priced_count if priced_count else 0.0
         
-        # 当前时间
-        current_time_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-        # 创建表格（使用蓝色背景和白色文字）
-        table = Table(
-            show_header=True, 
-            header_style="bold white on blue",
-            box=ROUNDED,
-            border_style="blue",
-            row_styles=["white on blue", "white on bright_blue"],
-            padding=(0, 1)
-        )
-        # 文字颜色统一为白色，涨跌比单独处理
-        table.add_column("名称", style="white", width=14, header_style="bold white on blue", justify="left")
-        table.add_column("代码", style="white", width=10, header_style="bold white on blue", justify="left")
-        table.add_column("现价", justify="right", style="white", width=8, header_style="bold white on blue")
-        table.add_column("涨跌幅", justify="right", style="white", width=8, header_style="bold white on blue")
-        table.add_column("成本价", justify="right", style="white", width=8, header_style="bold white on blue")
-        table.add_column("数量", justify="right", style="white", width=8, header_style="bold white on blue")
-        table.add_column("盈亏", justify="right", style="white", width=20, header_style="bold white on blue")
-        table.add_column("时间", justify="right", style="white", width=14, header_style="bold white on blue")
+        # 计算持仓股票数量（有持仓配置的股票数量）
+        holding_stock_count = int(np.count_nonzero(~np.isnan(cost)))
         
-        # 添加数据行
-        for data in stock_data_list:
-            if data['price'] is not None:
-                # 股票名称和代码：隐私模式隐藏
-                name = format_privacy_value(data['name'], privacy_mode)
-                code = format_privacy_value(data['code'], privacy_mode)
+        # 生成每行的单元格：行签名（影响显示的字段）未变化时直接复用上次生成的单元格
+        row_sigs = []
+        rows = []
+        for i, stock_code in enumerate(stock_codes):
+            state = stock_states[stock_code]
+            sig = (
+                state['last_stock_name'],
+                float(price[i]) if has_price[i] else None,
+                float(chg[i]) if has_price[i] else None,
+                float(qty[i]),
+                state['holding_price'],
+                state['last_update_time'],
+                privacy_mode,
+            )
+            row_sigs.append(sig)
+            cached = row_cache.get(stock_code)
+            if cached is not None and cached[0] == sig:
+                rows.append(cached[1])
+                continue
+            
+            # 股票名称和代码：隐私模式隐藏
+            name = format_privacy_value(state['last_stock_name'] or get_stock_name(stock_code), privacy_mode)
+            code = format_privacy_value(stock_code, privacy_mode)
+            # 成本价和数量：隐私模式隐藏
+            if privacy_mode:
+                holding_price_str = "***"
+                holding_quantity_str = "***"
+            else:
+                holding_price_str = format_price_fixed(state['holding_price'])
+                holding_quantity_str = f"{int(qty[i])}"
+            
+            if has_price[i]:
                 # 现价：固定两位小数，不trim掉0
-                price_str = format_price_fixed(data['price'])
+                price_str = format_price_fixed(float(price[i]))
                 
                 # 涨跌比：红涨绿跌（中国股市标准），在蓝色背景上显示
-                change_pct = data['change_pct']
-                if change_pct is not None:
-                    if change_pct > 0:
-                        change_str = Text(f"{change_pct:+.2f}%", style="bold red on blue")
-                    elif change_pct < 0:
-                        change_str = Text(f"{change_pct:+.2f}%", style="bold green on blue")
-                    else:
-                        change_str = Text(f"{change_pct:+.2f}%", style="white on blue")
-                else:
-                    change_str = Text("--", style="white on blue")
-                
-                # 持仓价格（成本价）：隐私模式隐藏
-                if privacy_mode:
-                    holding_price_str = "***"
-                else:
-                    holding_price_str = format_price_fixed(data['holding_price'])
-                
-                # 持仓数量：隐私模式隐藏
-                if privacy_mode:
-                    holding_quantity_str = "***"
-                else:
-                    holding_quantity_str = f"{int(data['holding_quantity'])}" if data['holding_quantity'] is not None else "--"
+                change_str = styled_change_pct(float(chg[i]))
                 
                 # 盈余（格式：金额(百分比)），隐私模式只隐藏金额，保留百分比
-                if data['profit'] is not None:
-                    profit_amount = data['profit']
-                    # 计算盈亏百分比：盈亏金额 / 持仓成本 * 100
-                    profit_pct = None
-                    if data['holding_price'] is not None and data['holding_quantity'] is not None and data['holding_quantity'] > 0:
-                        holding_cost = data['holding_price'] * data['holding_quantity']
-                        if holding_cost > 0:
-                            profit_pct = (profit_amount / holding_cost) * 100
-                    
-                    if profit_pct is not None:
+                if not np.isnan(profits[i]):
+                    profit_amount = float(profits[i])
+                    profit_pct = float(profit_pcts[i])
+                    if not np.isnan(profit_pct):
                         if privacy_mode:
-                            profit_str = f"***({profit_pct:+.2f}%)"
+                            profit_str = f"***({format_pct(profit_pct)})"
                         else:
-                            profit_str = f"{profit_amount:+.2f}({profit_pct:+.2f}%)"
+                            profit_str = f"{profit_amount:+.2f}({format_pct(profit_pct)})"
                     else:
                         profit_str = format_privacy_value(f"{profit_amount:+.2f}", privacy_mode)
                 else:
                     profit_str = "--"
                 
-                time_str = data['update_time']
-                table.add_row(
-                    name, 
-                    code, 
-                    price_str, 
-                    change_str, 
-                    holding_price_str, 
-                    holding_quantity_str, 
-                    profit_str, 
-                    time_str
-                )
+                cells = (name, code, price_str, change_str, holding_price_str,
+                         holding_quantity_str, profit_str, state['last_update_time'])
             else:
-                # 股票名称和代码：隐私模式隐藏
-                name = format_privacy_value(data['name'], privacy_mode)
-                code = format_privacy_value(data['code'], privacy_mode)
-                # 成本价和数量：隐私模式隐藏
-                if privacy_mode:
-                    holding_price_str = "***"
-                    holding_quantity_str = "***"
-                else:
-                    holding_price_str = format_price_fixed(data['holding_price'])
-                    holding_quantity_str = f"{int(data['holding_quantity'])}" if data['holding_quantity'] is not None else "--"
-                table.add_row(
-                    name, 
-                    code, 
-                    "获取数据失败", 
-                    "--", 
-                    holding_price_str, 
-                    holding_quantity_str, 
-                    "--", 
-                    data['update_time']
-                )
-                    
+                cells = (name, code, "获取数据失败", "--", holding_price_str,
+                         holding_quantity_str, "--", '--')
+            row_cache[stock_code] = (sig, cells)
+            rows.append(cells)
+        
+        # 整个画面（时间、资金、所有行）都没有变化时，直接返回上次的显示内容
+        frame_key = (current_time_str, available_funds, total_original_funds, privacy_mode, tuple(row_sigs))
+        if frame_key == display_cache['key']:
+            return display_cache['renderable']
+        
+        # 创建表格（列定义和样式在模块加载时已准备好）
+        table = _make_table()
+        
+        # 添加数据行
+        for cells in rows:
+            table.add_row(*cells)
+        
         # 计算总资产（可动用资金 + 持仓市值）
         total_assets = available_funds + total_holding_value
         
-        # 计算持仓股票数量（有持仓配置的股票数量）
-        holding_stock_count = sum(1 for code in stock_codes 
-                                 if stock_states[code]['holding_price'] is not None 
-                                 and stock_states[code]['holding_quantity'] is not None)
-        
         # 计算仓位百分比（持仓市值 / 总资产 * 100）
         position_pct = (total_holding_value / total_assets * 100) if total_assets > 0 else 0.0
         
@@ -1004,107 +1844,156 @@ def listen_stocks():
             total_profit_pct = (total_profit / total_original_funds) * 100
         
         # 第一行：时间:2026-01-15 10:19:43 | 自选股:2 | 涨跌幅:-2.54% | 持仓:1 | 盈亏:-343.87(-3.44%)
-        stats_text.append(f"时间:{current_time_str}", style="bold white")
-        stats_text.append(" | ", style="white")
-        stats_text.append(f"自选:{len(stock_codes)}", style="white")
-        stats_text.append(" | ", style="white")
+        stats_text.append(f"时间:{current_time_str}", style=STYLE_BOLD_WHITE)
+        stats_text.append(" | ", style=STYLE_WHITE)
+        stats_text.append(f"自选:{len(stock_codes)}", style=STYLE_WHITE)
+        stats_text.append(" | ", style=STYLE_WHITE)
         # 涨跌幅：红涨绿跌
         if overall_change_pct > 0:
-            stats_text.append(f"涨跌幅:{overall_change_pct:+.2f}%", style="bold red")
+            stats_text.append(f"涨跌幅:{overall_change_pct:+.2f}%", style=STYLE_UP)
         elif overall_change_pct < 0:
-            stats_text.append(f"涨跌幅:{overall_change_pct:+.2f}%", style="bold green")
+            stats_text.append(f"涨跌幅:{overall_change_pct:+.2f}%", style=STYLE_DOWN)
         else:
-            stats_text.append(f"涨跌幅:{overall_change_pct:+.2f}%", style="white")
-        stats_text.append(" | ", style="white")
-        stats_text.append(f"持仓:{holding_stock_count}", style="white")
-        stats_text.append(" | ", style="white")
+            stats_text.append(f"涨跌幅:{overall_change_pct:+.2f}%", style=STYLE_WHITE)
+        stats_text.append(" | ", style=STYLE_WHITE)
+        stats_text.append(f"持仓:{holding_stock_count}", style=STYLE_WHITE)
+        stats_text.append(" | ", style=STYLE_WHITE)
         # 盈亏：金额(百分比)，隐私模式只隐藏金额，保留百分比
         if total_profit_pct is not None:
             if privacy_mode:
                 # 隐私模式：只显示百分比
                 if total_profit_pct > 0:
-                    stats_text.append(f"盈亏:***({total_profit_pct:+.2f}%)", style="bold red")
+                    stats_text.append(f"盈亏:***({total_profit_pct:+.2f}%)", style=STYLE_UP)
                 elif total_profit_pct < 0:
-                    stats_text.append(f"盈亏:***({total_profit_pct:+.2f}%)", style="bold green")
+                    stats_text.append(f"盈亏:***({total_profit_pct:+.2f}%)", style=STYLE_DOWN)
                 else:
-                    stats_text.append(f"盈亏:***({total_profit_pct:+.2f}%)", style="white")
+                    stats_text.append(f"盈亏:***({total_profit_pct:+.2f}%)", style=STYLE_WHITE)
             else:
                 if total_profit > 0:
-                    stats_text.append(f"盈亏:{total_profit:+.2f}({total_profit_pct:+.2f}%)", style="bold red")
+                    stats_text.append(f"盈亏:{total_profit:+.2f}({total_profit_pct:+.2f}%)", style=STYLE_UP)
                 elif total_profit < 0:
-                    stats_text.append(f"盈亏:{total_profit:+.2f}({total_profit_pct:+.2f}%)", style="bold green")
+                    stats_text.append(f"盈亏:{total_profit:+.2f}({total_profit_pct:+.2f}%)", style=STYLE_DOWN)
                 else:
-                    stats_text.append(f"盈亏:{total_profit:+.2f}({total_profit_pct:+.2f}%)", style="white")
+                    stats_text.append(f"盈亏:{total_profit:+.2f}({total_profit_pct:+.2f}%)", style=STYLE_WHITE)
         else:
             if privacy_mode:
-                stats_text.append("盈亏:***", style="white")
+                stats_text.append("盈亏:***", style=STYLE_WHITE)
             else:
-                stats_text.append(f"盈亏:{total_profit:+.2f}", style="white")
+                stats_text.append(f"盈亏:{total_profit:+.2f}", style=STYLE_WHITE)
         stats_text.append("\n")
         
         # 第二行：本金:10000.00 | 实时市值:9656.13 | 持仓市值:5308.00 | 可用资金:4348.13 | 仓位:54.97%
         # 本金：隐私模式隐藏
         if privacy_mode:
-            stats_text.append("本金:***", style="white")
+            stats_text.append("本金:***", style=STYLE_WHITE)
         else:
-            stats_text.append(f"本金:{total_original_funds:.2f}", style="white")
-        stats_text.append(" | ", style="white")
+            stats_text.append(f"本金:{total_original_funds:.2f}", style=STYLE_WHITE)
+        stats_text.append(" | ", style=STYLE_WHITE)
         # 实时市值：隐私模式隐藏
         if privacy_mode:
-            stats_text.append("实时市值:***", style="bold white")
+            stats_text.append("实时市值:***", style=STYLE_BOLD_WHITE)
         else:
-            stats_text.append(f"实时市值:{total_assets:.2f}", style="bold white")
-        stats_text.append(" | ", style="white")
+            stats_text.append(f"实时市值:{total_assets:.2f}", style=STYLE_BOLD_WHITE)
+        stats_text.append(" | ", style=STYLE_WHITE)
         # 持仓市值：隐私模式隐藏
         if privacy_mode:
-            stats_text.append("持仓市值:***", style="white")
+            stats_text.append("持仓市值:***", style=STYLE_WHITE)
         else:
-            stats_text.append(f"持仓市值:{total_holding_value:.2f}", style="white")
-        stats_text.append(" | ", style="white")
+            stats_text.append(f"持仓市值:{total_holding_value:.2f}", style=STYLE_WHITE)
+        stats_text.append(" | ", style=STYLE_WHITE)
         # 可用资金：隐私模式隐藏
         if privacy_mode:
-            stats_text.append("可用资金:***", style="white")
+            stats_text.append("可用资金:***", style=STYLE_WHITE)
         else:
-            stats_text.append(f"可用资金:{available_funds:.2f}", style="white")
-        stats_text.append(" | ", style="white")
-        stats_text.append(f"仓位:{position_pct:.2f}%", style="white")
+            stats_text.append(f"可用资金:{available_funds:.2f}", style=STYLE_WHITE)
+        stats_text.append(" | ", style=STYLE_WHITE)
+        stats_text.append(f"仓位:{position_pct:.2f}%", style=STYLE_WHITE)
         
         # 组合输出
-        return Group(stats_text, table)
+        display_cache['key'] = frame_key
+        display_cache['renderable'] = Group(stats_text, table)
+        return display_cache['renderable']
     
-    # 初始化阶段：先获取一次数据，不显示rich界面（不检查交易时间，确保能获取到初始数据）
-    print("正在初始化，获取股票数据...")
-    for stock_code in stock_codes:
-        result = get_realtime_price(stock_code, yesterday_close_cache)
-        if result:
-            current_price, stock_name, yesterday_close, update_time = result
-            # 计算基于昨收的涨跌比
-            if yesterday_close and yesterday_close > 0:
-                change_pct = ((current_price - yesterday_close) / yesterday_close) * 100
-            else:
-                change_pct = 0.0
-            
-            # 检查价格报警（初始化时也检查）
-            triggered_up, triggered_down = check_price_alert(stock_code, current_price, stock_states)
-            if triggered_up or triggered_down:
-                # 触发报警：播放声音和终端闪烁
-                play_alert_sound()
+    def apply_price_results(codes: List[str], results: Dict, fetched_at: datetime) -> bool:
+        """处理一轮获取到的行情：批量检查价格报警，然后更新股票状态和列式数组
+        
+        :param codes: 本轮请求的股票代码
+        :param results: fetch_realtime_prices 的返回值
+        :param fetched_at: 获取完成的时间（所有股票共用）
+        :return: 是否至少获取到一只股票的数据
+        """
+        index = stock_arrays['index']
+        ok_codes = [c for c in codes if results.get(c)]
+        if not ok_codes:
+            return False
+        
+        # 检查价格报警（所有股票一次向量化比较，只对触发的股票逐个处理）
+        idx = np.fromiter((index[c] for c in ok_codes), dtype=np.intp, count=len(ok_codes))
+        current_prices = np.fromiter((results[c][0] for c in ok_codes), dtype=float, count=len(ok_codes))
+        up_hit, down_hit = check_price_alerts(stock_arrays, idx, current_prices)
+        hit = up_hit | down_hit
+        if hit.any():
+            # 触发报警：播放声音和终端闪烁
+            play_alert_sound()
+            alert_up_prices = stock_arrays['alert_up'][idx]
+            alert_down_prices = stock_arrays['alert_down'][idx]
+            for j in np.flatnonzero(hit):
+                stock_code = ok_codes[j]
+                current_price, stock_name = results[stock_code][0], results[stock_code][1]
                 # 终端闪烁（使用ANSI转义码）
-                if triggered_up:
-                    print(f"\033[5m\033[93m⚠️  报警：{stock_name}({stock_code}) 价格上升至 {current_price:.2f}，达到报警价格 {stock_states[stock_code].get('alert_up'):.2f}\033[0m", flush=True)
-                if triggered_down:
-                    print(f"\033[5m\033[91m⚠️  报警：{stock_name}({stock_code}) 价格下跌至 {current_price:.2f}，达到报警价格 {stock_states[stock_code].get('alert_down'):.2f}\033[0m", flush=True)
-            
-            stock_states[stock_code]['last_price'] = current_price
-            stock_states[stock_code]['last_time'] = datetime.now()
-            stock_states[stock_code]['last_stock_name'] = stock_name
-            stock_states[stock_code]['last_update_time'] = update_time
-            stock_states[stock_code]['last_change_pct'] = change_pct
-            initialized = True
+                if up_hit[j]:
+                    print_alert(ALERT_UP_PREFIX, f"⚠️  报警：{stock_name}({stock_code}) 价格上升至 {current_price:.2f}，达到报警价格 {alert_up_prices[j]:.2f}")
+                if down_hit[j]:
+                    print_alert(ALERT_DOWN_PREFIX, f"⚠️  报警：{stock_name}({stock_code}) 价格下跌至 {current_price:.2f}，达到报警价格 {alert_down_prices[j]:.2f}")
         
-        # 每个股票请求之间添加小延迟
-        if stock_code != stock_codes[-1]:
-            time.sleep(0.2)
+        # 计算基于昨收的涨跌比：昨收价在盘中不变，只在变化时重新计算 100/昨收价，之后每轮只做乘法
+        yc_arr = stock_arrays['yc']
+        inv_yc_arr = stock_arrays['inv_yc']
+        new_yc = np.nan_to_num(np.fromiter((results[c][2] or 0.0 for c in ok_codes), dtype=float, count=len(ok_codes)))
+        yc_changed = new_yc != yc_arr[idx]
+        if yc_changed.any():
+            changed_idx = idx[yc_changed]
+            yc_arr[changed_idx] = new_yc[yc_changed]
+            # 昨收价缺失或无效（<=0）时倒数记为 0，涨跌比即为 0，不需要逐个判断
+            inv_yc_arr[changed_idx] = np.divide(100.0, new_yc[yc_changed], out=np.zeros(len(changed_idx)), where=new_yc[yc_changed] > 0)
+        change_pcts = (current_prices - yc_arr[idx]) * inv_yc_arr[idx]
+        
+        # 遍历获取成功的股票，更新状态（获取失败的股票保持上次数据）
+        for j, stock_code in enumerate(ok_codes):
+            current_price, stock_name, _, update_time = results[stock_code]
+            state = stock_states[stock_code]
+            change_pct = float(change_pcts[j])
+            
+            # 如果价格有变化，或者距离上次打印超过1秒，则更新状态
+            last_time = state['last_time']
+            should_update = (state['last_price'] != current_price or 
+                           last_time is None or 
+                           (fetched_at - last_time).total_seconds() >= 1)
+            
+            if should_update:
+                i = index[stock_code]
+                stock_arrays['price'][i] = current_price
+                stock_arrays['chg'][i] = change_pct
+                state['last_price'] = current_price
+                state['last_time'] = fetched_at
+                state['last_stock_name'] = stock_name
+                state['last_update_time'] = update_time
+                state['last_change_pct'] = change_pct
+        return True
+    
+    # 构建列式数组（价格/持仓数量/成本价/涨跌幅/报警价格），后续每次价格更新时原地修改
+    stock_arrays = build_stock_arrays(stock_states)
+    # 显示顺序（stock_codes）对应的数组下标，只在配置变化时重新计算
+    display_idx = np.array([stock_arrays['index'][code] for code in stock_codes], dtype=np.intp)
+    
+    # 初始化阶段：先获取一次数据，不显示rich界面（不检查交易时间，确保能获取到初始数据）
+    print("正在初始化，获取股票数据...")
+    init_results = fetch_realtime_prices(stock_codes, stock_states, yesterday_close_cache)
+    # 初始化时也检查价格报警
+    initialized = apply_price_results(stock_codes, init_results, datetime.now())
+    
+    # 初始化中新获取到的昨收价统一写盘一次
+    flush_yesterday_close_cache(yesterday_close_cache, yesterday_date)
     
     # 如果初始化失败，提示并退出
     if not initialized:
@@ -1112,125 +2001,115 @@ def listen_stocks():
         return
     
     # 初始化完成，清屏后开始使用rich界面显示
-    os.system('clear' if os.name != 'nt' else 'cls')  # Linux/Mac 使用 clear，Windows 使用 cls
+    console.clear()  # 直接输出清屏控制序列，不需要启动 clear/cls 子进程
     
     # 初始化当前日期
-    last_saved_date = datetime.now().strftime("%Y-%m-%d")
+    now = datetime.now()
+    now_str = now.strftime("%Y-%m-%d %H:%M:%S")
+    today = now_str[:10]
+    last_saved_date = today
+    # 当天停止更新的截止时间（日期变化时重新计算）
+    stop_deadline = compute_stop_deadline(now)
+    
+    # 本轮之后数据是否有变化（获取到新价格或重新加载了配置）；启动时先保存一次初始数据
+    state_changed = True
+    # 当前分钟内在交易时间的股票：{'key': (星期, 当天分钟数), 'codes': 股票代码列表}，重新加载配置时清空
+    active_codes_cache: Dict = {'key': None, 'codes': []}
     
     # 使用Live进行实时更新（screen=True 表示全屏显示，不滚动，类似 top 命令）
     try:
-        with Live(generate_display(), refresh_per_second=2, screen=True) as live:
+        shown_display = generate_display(now_str)
+        with Live(shown_display, refresh_per_second=2, screen=True) as live:
             while True:
                 try:
+                    # 当前时间每轮只取一次并格式化一次，显示、交易时间判断、日期检查共用
+                    now = datetime.now()
+                    now_str = now.strftime("%Y-%m-%d %H:%M:%S")
+                    today = now_str[:10]
+                    
                     # 检查是否应该停止更新（超过15:01）
-                    stop_updating = should_stop_updating()
+                    stop_updating = should_stop_updating(stop_deadline)
                     
-                    if not stop_updating:
-                        # 遍历所有股票，收集数据
-                        for stock_code in stock_codes:
-                            # 检查是否在交易时间内
-                            if not is_trading_time(stock_code, market_hours_config):
-                                # 不在交易时间，跳过该股票
-                                continue
-                            
-                            # 防封禁：确保请求间隔
-                            current_time = time.time()
-                            time_since_last = current_time - last_request_time
-                            if time_since_last < MIN_REQUEST_INTERVAL:
-                                sleep_time = MIN_REQUEST_INTERVAL - time_since_last + random.uniform(0, MAX_RANDOM_DELAY)
-                                time.sleep(sleep_time)
-                            
-                            last_request_time = time.time()
-                            result = get_realtime_price(stock_code, yesterday_close_cache)
-                            stock_name = get_stock_name(stock_code)  # 默认名称
-                            
-                            if result:
-                                current_price, stock_name, yesterday_close, update_time = result
-                                last_price = stock_states[stock_code]['last_price']
-                                last_time = stock_states[stock_code]['last_time']
-                                
-                                # 计算基于昨收的涨跌比
-                                if yesterday_close and yesterday_close > 0:
-                                    change_pct = ((current_price - yesterday_close) / yesterday_close) * 100
-                                else:
-                                    change_pct = 0.0
-                                
-                                # 检查价格报警
-                                triggered_up, triggered_down = check_price_alert(stock_code, current_price, stock_states)
-                                if triggered_up or triggered_down:
-                                    # 触发报警：播放声音和终端闪烁
-                                    play_alert_sound()
-                                    # 终端闪烁（使用ANSI转义码）
-                                    if triggered_up:
-                                        print(f"\033[5m\033[93m⚠️  报警：{stock_name}({stock_code}) 价格上升至 {current_price:.2f}，达到报警价格 {stock_states[stock_code].get('alert_up'):.2f}\033[0m", flush=True)
-                                    if triggered_down:
-                                        print(f"\033[5m\033[91m⚠️  报警：{stock_name}({stock_code}) 价格下跌至 {current_price:.2f}，达到报警价格 {stock_states[stock_code].get('alert_down'):.2f}\033[0m", flush=True)
-                                
-                                # 如果价格有变化，或者距离上次打印超过1秒，则更新状态
-                                current_datetime = datetime.now()
-                                should_update = (last_price != current_price or 
-                                               last_time is None or 
-                                               (current_datetime - last_time).total_seconds() >= 1)
-                                
-                                if should_update:
-                                    stock_states[stock_code]['last_price'] = current_price
-                                    stock_states[stock_code]['last_time'] = current_datetime
-                                    stock_states[stock_code]['last_stock_name'] = stock_name
-                                    stock_states[stock_code]['last_update_time'] = update_time
-                                    stock_states[stock_code]['last_change_pct'] = change_pct
-                            else:
-                                # 获取数据失败，尝试使用上次数据
-                                if stock_states[stock_code]['last_price'] is None:
-                                    # 没有上次数据，保持默认状态
-                                    pass
-                            
-                            # 每个股票请求之间添加小延迟
-                            if stock_code != stock_codes[-1]:
-                                time.sleep(0.2)
-                    # 如果超过15:01，不再从接口更新数据，但程序继续运行，界面继续显示
+                    # 只获取在交易时间内的股票（不在交易时间的跳过，休市时不发任何请求）
+                    if stop_updating:
+                        active_codes = []
+                    else:
+                        # 交易时间只精确到分钟，同一分钟内直接复用上次的结果
+                        weekday = now.isoweekday()
+                        minute_of_day = now.hour * 60 + now.minute
+                        if active_codes_cache['key'] != (weekday, minute_of_day):
+                            active_codes_cache['key'] = (weekday, minute_of_day)
+                            active_codes_cache['codes'] = [c for c in stock_codes if is_trading_time(stock_states[c]['market'], market_hours_config, weekday, minute_of_day)]
+                        active_codes = active_codes_cache['codes']
                     
-                    # Live会自动调用generate_display()更新显示，但也可以手动触发
-                    live.update(generate_display())
+                    if active_codes:
+                        state_changed = True
+                        # 并发获取所有股票数据
+                        results = fetch_realtime_prices(active_codes, stock_states, yesterday_close_cache)
+                        # 获取完成的时间（所有股票共用）
+                        fetched_at = datetime.now()
+                        
+                        # 检查价格报警并更新状态
+                        apply_price_results(active_codes, results, fetched_at)
+                        
+                        # 本轮新获取到的昨收价统一写盘一次
+                        flush_yesterday_close_cache(yesterday_close_cache, yesterday_date)
+                    # 如果超过15:01，不再从接口更新数据，但程序继续运行，界面继续显示
                     
                     # 检查配置文件是否被修改，如果修改则重新加载配置（动态更新）
-                    reload_config_if_changed()
+                    # 有文件监听时只在收到变更事件后检查，否则每轮按修改时间检查
+                    if not config_watched or _config_dirty.is_set():
+                        _config_dirty.clear()
+                        if reload_config_if_changed():
+                            state_changed = True
+                    
+                    # 休市时价格不会变化：只有数据或配置变化时才刷新显示
+                    if state_changed:
+                        # Live会自动调用generate_display()更新显示，但也可以手动触发
+                        # 画面没有变化时 generate_display() 返回同一个对象，不需要更新
+                        display = generate_display(now_str)
+                        if display is not shown_display:
+                            live.update(display)
+                            shown_display = display
                     
                     # 检查日期是否变化，如果变化则保存前一天的历史数据
-                    current_date = datetime.now().strftime("%Y-%m-%d")
-                    if last_saved_date is not None and last_saved_date != current_date:
+                    if last_saved_date is not None and last_saved_date != today:
                         # 日期变化，保存前一天的历史数据（包含详细K线数据）
-                        save_yesterday_history(stock_states, funds_config, yesterday_close_cache, last_saved_date)
-                    last_saved_date = current_date
-                    
-                    # 每次更新后都保存当天数据（实时保存，避免程序崩溃丢失数据）
-                    current_date_str = datetime.now().strftime("%Y-%m-%d")
-                    save_yesterday_history(stock_states, funds_config, yesterday_close_cache, current_date_str)
+                        save_history_now(stock_states, funds_config, yesterday_close_cache, last_saved_date, stock_arrays)
+                        # 新的一天，重新计算停止更新的截止时间
+                        stop_deadline = compute_stop_deadline(now)
+                        # 清空价格格式化缓存，避免长期运行时无限增长
+                        _fmt.cache_clear()
+                    last_saved_date = today
                     
-                    # 如果时间超过15:01，停止从接口更新数据，但程序继续运行
-                    if should_stop_updating():
-                        # 不再从接口更新数据，但程序继续运行
-                        pass
+                    # 每次更新后都请求保存当天数据（后台合并保存，程序崩溃最多丢失 SAVE_DEBOUNCE_S 秒的数据）
+                    # 休市时数据没有变化，不需要重复保存
+                    if state_changed:
+                        save_history_debounced(stock_states, funds_config, yesterday_close_cache, today, stock_arrays)
+                        state_changed = False
                     
-                    # 计算下次请求前的等待时间
-                    sleep_time = max(0, POLL_INTERVAL) + random.uniform(0, MAX_RANDOM_DELAY)
+                    # 计算下次请求前的等待时间（休市时延长等待，减少无用的唤醒）
+                    if active_codes:
+                        sleep_time = max(0, POLL_INTERVAL) + random.uniform(0, MAX_RANDOM_DELAY)
+                    else:
+                        sleep_time = IDLE_POLL_INTERVAL
+                    if not stop_updating:
+                        # 不要睡过停止更新的时间点，到点后按时停止
+                        sleep_time = min(sleep_time, max(0, stop_deadline - time.monotonic()))
                     time.sleep(sleep_time)
                     
                 except KeyboardInterrupt:
-                    # 程序退出前，最后保存一次当天数据
-                    current_date_str = datetime.now().strftime("%Y-%m-%d")
-                    save_yesterday_history(stock_states, funds_config, yesterday_close_cache, current_date_str)
+                    # 程序退出前，取消排队中的行情请求，最后保存一次当天数据
+                    shutdown_fetch_executor()
+                    save_history_now(stock_states, funds_config, yesterday_close_cache, today, stock_arrays)
                     break
-                except Exception as e:
-                    error_msg = str(e)
-                    # 如果是限流错误，增加等待时间
-                    if "429" in error_msg or "rate limit" in error_msg.lower() or "限流" in error_msg:
-                        time.sleep(RETRY_DELAY * 2)
-                    else:
-                        time.sleep(RETRY_DELAY)
+                except Exception:
+                    # 限流等HTTP错误已由会话的重试策略处理，这里只做兜底等待
+                    time.sleep(RETRY_DELAY)
     except Exception as e:
-        # 程序异常退出前，最后保存一次当天数据
-        current_date_str = datetime.now().strftime("%Y-%m-%d")
-        save_yesterday_history(stock_states, funds_config, yesterday_close_cache, current_date_str)
+        # 程序异常退出前，取消排队中的行情请求，最后保存一次当天数据
+        shutdown_fetch_executor()
+        save_history_now(stock_states, funds_config, yesterday_close_cache, today, stock_arrays)
         raise
 
 